@@ -5,6 +5,7 @@ Simple test to verify the playwright tools discovery fix works correctly.
 import asyncio
 import sys
 import traceback
+from urllib.parse import urlsplit
 from exp_tools import PlaywrightTools
 
 async def simple_test():
@@ -64,7 +65,7 @@ async def simple_test():
         if tools.pages[0]:
             current_url = tools.pages[0].url
             print(f"Current URL after clicking: {current_url}")
-            if "iana" in current_url.lower():
+            if urlsplit(current_url).netloc.endswith("iana.org"):
                 print("✅ SUCCESS! Clicked and navigated to the IANA page")
             else:
                 print("❌ FAILURE: Page navigation not as expected")
@@ -2,63 +2,93 @@
 """
 Verification script for the fixed playwright_smart_click function in exp_tools.py.
 This script demonstrates that the fixed function works correctly.
+
+Each scenario runs on its own page of the shared browser, so the scenarios are
+run concurrently. Concurrency is capped at min(cpu_count, 4) so small CI runners
+are not flooded with pages; set PW_MAX_CONCURRENCY to override the cap.
 """
 import asyncio
+import os
 import time
+from urllib.parse import urlsplit
 from exp_tools import PlaywrightTools
 
+# Cap on concurrently running scenarios (one page each on the shared browser)
+MAX_CONCURRENCY = int(os.getenv("PW_MAX_CONCURRENCY", min(os.cpu_count() or 2, 4)))
+
+async def scenario_click_more_information(tools, page_index):
+    """Test 1: Navigate to example.com and click 'More information'."""
+    nav_result = await tools.playwright_navigate("https://example.com", page_index=page_index)
+    print(f"[page {page_index}] Navigation status: {nav_result['status']}")
+
+    # Take a screenshot for reference
+    screenshot_result = await tools.playwright_screenshot("before_click.png", page_index=page_index)
+    print(f"[page {page_index}] Screenshot saved to: {screenshot_result.get('filename')}")
+
+    # Use smart_click to click the "More information" link
+    print(f"[page {page_index}] Clicking 'More information' with smart_click...")
+    click_result = await tools.playwright_smart_click("More information", element_type="link",
+                                                      page_index=page_index, capture_screenshot=True)
+    print(f"[page {page_index}] Smart click result: {click_result}")
+
+    # Verify we're on the IANA page
+    if urlsplit(tools.pages[page_index].url).netloc.endswith("iana.org"):
+        print(f"[page {page_index}] ✅ Successfully clicked and navigated to IANA page")
+    else:
+        print(f"[page {page_index}] ❌ Navigation failed or went to unexpected page")
+
+    # Take another screenshot to verify
+    await tools.playwright_screenshot("after_click.png", page_index=page_index)
+
+async def scenario_click_nonexistent_text(tools, page_index):
+    """Test 2: Try a click on text that doesn't exist."""
+    await tools.playwright_navigate("https://example.com", page_index=page_index)
+    nonexistent_result = await tools.playwright_smart_click("This text does not exist",
+                                                            page_index=page_index, max_attempts=2)
+    print(f"[page {page_index}] Expected error result: {nonexistent_result}")
+    if nonexistent_result["status"] == "error":
+        print(f"[page {page_index}] ✅ Correctly handled non-existent element")
+
+async def scenario_any_element_type(tools, page_index):
+    """Test 3: Test with different element types."""
+    await tools.playwright_navigate("https://example.com", page_index=page_index)
+    # Try with "any" element type (default)
+    any_result = await tools.playwright_smart_click("More information", page_index=page_index)
+    print(f"[page {page_index}] 'any' element type result: {any_result['status']}")
+
+SCENARIOS = [
+    scenario_click_more_information,
+    scenario_click_nonexistent_text,
+    scenario_any_element_type,
+]
+
 async def test_smart_click():
     """Test the fixed playwright_smart_click function with several different scenarios."""
     tools = PlaywrightTools()
-    
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def run(scenario, page_index):
+        async with semaphore:
+            print(f"\nRunning {scenario.__name__} on page {page_index}")
+            await scenario(tools, page_index)
+
     try:
         # Initialize the browser
         print("Initializing PlaywrightTools...")
         await tools.initialize()
         print("✅ Browser initialized")
-        
-        # First test: Navigate to Example.com and click "More information"
-        print("\nTest 1: Navigate to example.com and click 'More information'")
-        nav_result = await tools.playwright_navigate("https://example.com")
-        print(f"Navigation status: {nav_result['status']}")
-        
-        # Take a screenshot for reference
-        screenshot_result = await tools.playwright_screenshot("before_click.png")
-        print(f"Screenshot saved to: {screenshot_result.get('filename')}")
-        
-        # Use smart_click to click the "More information" link
-        print("Clicking 'More information' with smart_click...")
-        click_result = await tools.playwright_smart_click("More information", element_type="link", capture_screenshot=True)
-        print(f"Smart click result: {click_result}")
-        
-        # Verify we're on the IANA page
-        if "iana" in tools.pages[0].url.lower():
-            print("✅ Successfully clicked and navigated to IANA page")
-        else:
-            print("❌ Navigation failed or went to unexpected page")
-            
-        # Take another screenshot to verify
-        await tools.playwright_screenshot("after_click.png")
-        
-        # Second test: Try a click on text that doesn't exist
-        print("\nTest 2: Try to click non-existent text")
-        nonexistent_result = await tools.playwright_smart_click("This text does not exist", max_attempts=2)
-        print(f"Expected error result: {nonexistent_result}")
-        if nonexistent_result["status"] == "error":
-            print("✅ Correctly handled non-existent element")
-        
-        # Return to example.com for the third test
-        print("\nReturning to example.com...")
-        await tools.playwright_navigate("https://example.com")
-        
-        # Third test: Test with different element types
-        print("\nTest 3: Test with different element types")
-        # Try with "any" element type (default)
-        any_result = await tools.playwright_smart_click("More information")
-        print(f"'any' element type result: {any_result['status']}")
-        
+        print(f"Running {len(SCENARIOS)} scenarios with concurrency {MAX_CONCURRENCY}")
+
+        results = await asyncio.gather(
+            *(run(scenario, index) for index, scenario in enumerate(SCENARIOS)),
+            return_exceptions=True
+        )
+        for scenario, result in zip(SCENARIOS, results):
+            if isinstance(result, Exception):
+                print(f"Error during {scenario.__name__}: {result}")
+
         print("\nAll tests completed!")
-        
+
     except Exception as e:
         print(f"Error during test: {e}")
     finally:
@@ -4,35 +4,225 @@ MCP Tools - Collection of browser automation tools for the MCP protocol
 Includes code generation and browser automation tools used by the MCP agent.
 """
 import asyncio
+import atexit
+import collections
+import functools
+import inspect
+import itertools
 import json
 import logging
+import logging.handlers
 import os
+import pathlib
+import queue
+import random
+import re
 import time
-from typing import Any, Dict, List, Optional, Union
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page, CDPSession, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, CDPSession, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 
 # Configure logging
 logger = logging.getLogger("mcp_tools")
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+def _start_log_listener() -> None:
+    """Hand mcp_tools records to the root handlers on a background thread.
+    
+    Keeps console and file I/O for log records off the event loop. Does nothing
+    if the listener is already running or logging has not been configured.
+    """
+    global _log_listener
+    root_handlers = logging.getLogger().handlers
+    if _log_listener is not None or not root_handlers:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *root_handlers, respect_handler_level=True)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+# URL schemes accepted as-is by the navigation tools
+_URL_SCHEMES = ('http://', 'https://')
+
+# Browser context defaults
+_DEFAULT_VIEWPORT = {"width": 1425, "height": 776}
+_DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Screenshot timeouts in milliseconds: the requested capture, debug and optional
+# captures, and the last-resort fallbacks
+_SCREENSHOT_TIMEOUT_MS = 15000
+# Page screenshot options for the default call, shared read-only between calls
+_DEFAULT_SS_OPTS = MappingProxyType({"full_page": False, "omit_background": False})
+_AUX_SCREENSHOT_TIMEOUT_MS = 5000
+_FALLBACK_SCREENSHOT_TIMEOUT_MS = 3000
+
+# Patterns playwright_smart_click uses to pull the target text out of a selector
+_HAS_TEXT_RE = re.compile(r":has-text\(['\"]([^'\"]+)['\"]\)")
+_TEXT_PSEUDO_RE = re.compile(r":text\(['\"]([^'\"]+)['\"]\)")
+_ARIA_LABEL_RE = re.compile(r"\[aria-label=['\"]([^'\"]+)['\"]\]")
+
+# Words in a click selector that suggest it targets a cookie consent button
+_COOKIE_KEYWORDS = ("cookie", "accept", "consent")
+
+# Common selectors for cookie accept buttons, tried when a cookie selector doesn't work.
+# They are matched as two unions so one query covers them all.
+_CSS_COOKIE_UNION = ", ".join((
+    "#accept-cookies",
+    ".cookie-accept",
+    "[aria-label='Accept cookies']",
+    "[aria-label='Accept All']",
+    "[aria-label='Accept all']",
+))
+_TEXT_COOKIE_UNION = ", ".join((
+    "button:has-text('Accept')",
+    "button:has-text('Accept All')",
+    "button:has-text('Accept all')",
+    "button:has-text('I accept')",
+    "button:has-text('Allow all')",
+    "button:has-text('Allow cookies')",
+))
+
+# Common selectors for search inputs, tried when every other fill strategy fails
+_COMMON_SEARCH_SELECTORS = (
+    "input[type='search']",
+    "input[type='text']",
+    "input.search-box",
+    "input.searchbox",
+    "input.gLFyf",  # Google search class
+    ".search-input",
+    "#search-input",
+    "[aria-label='Search']",
+    "[placeholder*='Search']",
+    "[placeholder*='search']",
+)
+
+def _with_page(method):
+    """Decorator for tools that act on a single page.
+    
+    The wrapped method takes the resolved page as its first argument after self.
+    Callers still pass page_index as before: the wrapper looks the page up, returns
+    the usual error if it is missing or closed, and runs the method under that page's
+    lock so commands to one page don't interleave. Decorated tools must not call each
+    other on the same page, since the lock is not reentrant.
+    """
+    signature = inspect.signature(method)
+    params = list(signature.parameters.values())
+    # The public signature leaves out the injected page, so tool discovery sees page_index only
+    public_signature = signature.replace(parameters=[params[0]] + params[2:])
+    
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        bound = public_signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        page_index = bound.arguments["page_index"]
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
+        async with self._page_locks[page_index]:
+            return await method(self, page, *args, **kwargs)
+    
+    wrapper.__signature__ = public_signature
+    return wrapper
+
+# Selector templates playwright_smart_click fills in with the text, grouped by kind of element.
+# Groups are tried in priority order; within a group the first match in the document wins.
+_BUTTON_TEMPLATES = (
+    "button:has-text('{v}')",
+    "button[value='{v}' i]",
+    "input[type='submit'][value='{v}' i]",
+    "[role='button']:has-text('{v}')",
+)
+_LINK_TEMPLATES = (
+    "a:has-text('{v}')",
+    "[role='link']:has-text('{v}')",
+)
+# :text() matches the smallest element containing the text, unlike a bare :has-text(),
+# which also matches every ancestor up to <body>
+_GENERIC_TEMPLATES = (
+    ":text('{v}')",
+    "[aria-label='{v}' i]",
+    "[title='{v}' i]",
+)
+_SELECTOR_TEMPLATES: Dict[str, tuple] = {
+    "button": (_BUTTON_TEMPLATES,),
+    "link": (_LINK_TEMPLATES,),
+    "any": (_BUTTON_TEMPLATES, _LINK_TEMPLATES, _GENERIC_TEMPLATES),
+}
+
+@functools.lru_cache(maxsize=512)
+def _build_smart_selectors(text: str, element_type: str) -> tuple:
+    """Build the selector groups playwright_smart_click tries for a piece of text.
+    
+    Returns a tuple of groups in priority order (buttons, links, then generic
+    elements), each a tuple of selectors.
+    
+    Args:
+        text: The text to look for
+        element_type: Type of element to target ('button', 'link', 'any')
+    """
+    # :has-text() and :text() already match case-insensitively, and the attribute selectors
+    # use the CSS "i" flag, so a single spelling of the text covers every casing
+    groups = _SELECTOR_TEMPLATES.get(element_type, _SELECTOR_TEMPLATES["any"])
+    return tuple(
+        tuple(template.format(v=text) for template in templates)
+        for templates in groups
+    )
+
+# Optional accessibility node properties copied into processed snapshots
+_A11Y_PROPS = ("value", "description", "checked", "pressed")
+_A11Y_PROPS_EXTENDED = _A11Y_PROPS + ("level", "selected", "expanded", "focused", "disabled")
+
+def _process_a11y_tree(root: Dict[str, Any], props: tuple = _A11Y_PROPS) -> Dict[str, Any]:
+    """Reduce an accessibility snapshot to role, name, depth and the given properties.
+    
+    Walks the tree with an explicit stack, so deep trees can't hit the recursion limit.
+    
+    Args:
+        root: Root node of the snapshot, as returned by page.accessibility.snapshot()
+        props: Optional node properties to keep when present
+    """
+    result = {}
+    # Each entry is a node plus the dict its processed form is written into
+    stack = [(root, 0, result)]
+    while stack:
+        node, depth, processed = stack.pop()
+        processed["role"] = node.get("role", "")
+        processed["name"] = node.get("name", "")
+        processed["depth"] = depth
+        
+        # Add optional properties if they exist
+        for prop in props:
+            if prop in node:
+                processed[prop] = node[prop]
+        
+        children = node.get("children")
+        if children:
+            slots = [{} for _ in children]
+            processed["children"] = slots
+            stack.extend(zip(children, itertools.repeat(depth + 1), slots))
+    
+    return result
 
 class CodeGenSession:
     """Represents a code generation session."""
-    def __init__(self, session_id: str, name: str, language: str):
+    __slots__ = ("session_id", "name", "language", "code", "created_at", "updated_at", "_now", "_view")
+    
+    def __init__(self, session_id: str, name: str, language: str,
+                 now: Callable[[], float] = time.monotonic):
         self.session_id = session_id
         self.name = name
         self.language = language
         self.code = ""
-        self.created_at = asyncio.get_event_loop().time()
+        self._now = now
+        self.created_at = now()
         self.updated_at = self.created_at
-    
-    def update(self, code: str):
-        """Update the code in the session."""
-        self.code = code
-        self.updated_at = asyncio.get_event_loop().time()
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert the session to a dictionary."""
-        return {
+        
+        # Dictionary view handed out by to_dict, kept in sync by update()
+        self._view = {
             "session_id": self.session_id,
             "name": self.name,
             "language": self.language,
@@ -40,64 +230,125 @@ class CodeGenSession:
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
+    
+    def update(self, code: str):
+        """Update the code in the session."""
+        self.code = code
+        self.updated_at = self._now()
+        self._view["code"] = code
+        self._view["updated_at"] = self.updated_at
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the session to a dictionary.
+        
+        Returns the cached view rather than a copy; it is serialized by the
+        transport before the session can change again.
+        """
+        return self._view
 
 class PlaywrightTools:
-    """Collection of Playwright browser automation tools."""
-    def __init__(self):
+    """Collection of Playwright browser automation tools.
+    
+    Args:
+        cdp_endpoint: CDP endpoint of an already running Chromium to connect to instead of
+            launching one (defaults to the PLAYWRIGHT_CDP_ENDPOINT environment variable).
+            Several instances, e.g. one per worker process, can share the same browser
+            this way; each still gets its own browser context.
+        user_agent: User agent for the browser contexts this instance creates
+    """
+    def __init__(self, cdp_endpoint: Optional[str] = None, user_agent: Optional[str] = None):
+        self.cdp_endpoint = cdp_endpoint or os.getenv("PLAYWRIGHT_CDP_ENDPOINT")
+        self.user_agent = user_agent or _DEFAULT_USER_AGENT
         self.playwright = None
         self.browser = None
         self.context = None
         self.pages = []
+        # Upper bound on page slots; a closed page leaves a None slot for reuse
+        self._max_pages = 64
+        # One lock per page index, held by the @_with_page tools
+        self._page_locks = collections.defaultdict(asyncio.Lock)
         self.codegen_sessions = {}  # Map of session_id to CodeGenSession
-        self.console_logs = []
+        self._codegen_counter = itertools.count(1)  # Session ids are never reused
+        self.console_logs = collections.deque(maxlen=8192)
+        # The same log entries indexed by page, so one page's logs can be read without a scan
+        self._console_by_page = collections.defaultdict(lambda: collections.deque(maxlen=500))
+        # The persistent dialog handler installed on each page, so it can be removed again
+        self._dialog_handlers: Dict[Page, Callable] = {}
+        # Per page, the fallback selector that filled a requested selector on the current document
+        self._resolved_selectors: Dict[Page, Dict[str, str]] = {}
+        # Per page, the content frames found for iframe selectors on the current document
+        self._iframe_frames: Dict[Page, Dict[str, Any]] = {}
+        # Raw console events are queued by the page listeners and formatted in batches
+        # by a background drainer so busy pages don't build a dict per event on the loop
+        self._console_raw = asyncio.Queue(maxsize=16384)
+        self._console_dropped = 0
+        self._console_task = None
         self.browser_initialized = False  # Track if browser is initialized
-        
-        # Create a screenshots directory if it doesn't exist
+        self._loop = None  # Running event loop, cached on first use
+        self._init_lock = asyncio.Lock()  # Serializes browser launch between concurrent callers
+        self._ctx_pool = []  # Pre-warmed spare contexts used to recover from a closed context
+        self._ctx_pool_max = 2
+        self._prewarm_task = None
+        self._pending_writes = set()  # Screenshot files still being written in worker threads
+        self._max_pending_writes = 8
+        
+        # The screenshots directory is created on first use by _get_screenshot_path
         self.screenshot_dir = os.path.join(os.getcwd(), "screenshots")
-        os.makedirs(self.screenshot_dir, exist_ok=True)
-        logger.info(f"Screenshots will be saved to: {self.screenshot_dir}")
+        self._screenshot_prefix = None  # screenshot_dir with a trailing separator, once created
     
     # === Helper Methods ===
     
     async def initialize(self):
         """Initialize Playwright without launching a browser."""
         try:
+            self._loop = asyncio.get_running_loop()
+            _start_log_listener()
+            
             # Launch Playwright but don't create a browser yet
             self.playwright = await async_playwright().start()
             logger.info("Playwright initialized")
             
+            # Start draining captured console events in the background
+            if self._console_task is None or self._console_task.done():
+                self._console_task = asyncio.create_task(self._drain_console())
+            
             # Pre-initialize browser for better reliability
             try:
-                print("Pre-initializing browser for better reliability...")
-                await self._ensure_browser_initialized()
-                print("Browser pre-initialized successfully")
+                logger.debug("Pre-initializing browser for better reliability...")
+                if not self.browser_initialized:
+                    await self._ensure_browser_initialized()
+                logger.debug("Browser pre-initialized successfully")
             except Exception as browser_err:
-                logger.warning(f"Browser pre-initialization failed (will retry when needed): {browser_err}")
+                logger.warning("Browser pre-initialization failed (will retry when needed): %s", browser_err)
                 
             return True
         except Exception as e:
-            logger.error(f"Failed to initialize Playwright: {e}")
+            logger.error("Failed to initialize Playwright: %s", e)
             return False
     
     async def _ensure_browser_initialized(self):
         """Ensure browser is initialized before using it."""
-        if not self.browser_initialized:
+        # Fast path once the browser is up, no lock needed
+        if self.browser_initialized:
+            return
+        
+        async with self._init_lock:
+            # Another caller may have finished initializing while we waited
+            if self.browser_initialized:
+                return
+            
             try:
                 # Launch browser when needed
-                # Note: user_data_dir is not supported in newer versions of Playwright
-                self.browser = await self.playwright.chromium.launch(
-                    headless=False
-                    # Removed user_data_dir as it's causing an error
-                )
+                self.browser = await self._launch_browser()
                 
                 # Create context with maximized viewport
-                viewport_size = {"width": 1425, "height": 776}  # Updated viewport size
-                self.context = await self.browser.new_context(
-                    viewport=viewport_size,
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
+                viewport_size = _DEFAULT_VIEWPORT
+                self.context = await self._new_default_context()
                 self.browser_initialized = True
-                logger.info(f"Browser initialized with viewport size {viewport_size}")
+                logger.info("Browser initialized with viewport size %s", viewport_size)
+                
+                # Warm a spare context in the background so recovery doesn't pay for it
+                self._prewarm_task = asyncio.create_task(self._prewarm_context())
                 
                 # Create a page if needed
                 if len(self.pages) == 0:
@@ -106,8 +357,8 @@ class PlaywrightTools:
                     # Set viewport directly on the page as well to ensure it's applied
                     await page.set_viewport_size(viewport_size)
                     
-                    self.pages.append(page)
-                    logger.info(f"Created new page with viewport size {viewport_size}")
+                    self._set_page(0, page)
+                    logger.info("Created new page with viewport size %s", viewport_size)
                 
                 # For truly maximizing the window, use multiple approaches
                 try:
@@ -120,34 +371,30 @@ class PlaywrightTools:
                     logger.info("Browser window maximized via CDP")
                 except Exception as e:
                     # Log the error but continue - viewport size should still be large
-                    logger.warning(f"Could not maximize window via CDP: {e}")
+                    logger.warning("Could not maximize window via CDP: %s", e)
                     logger.info("Continuing with large viewport size only")
                     
-                    # 2. Try JavaScript approach if CDP fails
+                    # 2. If CDP fails, resize and request fullscreen via JavaScript in a
+                    #    single evaluate so the fallback costs one round-trip
                     try:
-                        # Try to maximize window using JavaScript
                         await self.pages[0].evaluate("""() => {
-                            if (window.screen && window.screen.availWidth) {
-                                window.resizeTo(window.screen.availWidth, window.screen.availHeight);
-                            }
+                            try {
+                                if (window.screen && window.screen.availWidth) {
+                                    window.resizeTo(window.screen.availWidth, window.screen.availHeight);
+                                }
+                            } catch (e) {}
+                            try {
+                                if (document.documentElement.requestFullscreen) {
+                                    document.documentElement.requestFullscreen();
+                                }
+                            } catch (e) {}
                         }""")
-                        logger.info("Attempted window maximization with JavaScript")
+                        logger.info("Attempted window maximization and fullscreen with JavaScript")
                     except Exception:
                         # Just continue if this also fails
                         pass
-                        
-                    # 3. Try fullscreen as a last resort
-                    try:
-                        await self.pages[0].evaluate("""() => {
-                            if (document.documentElement.requestFullscreen) {
-                                document.documentElement.requestFullscreen();
-                            }
-                        }""")
-                        logger.info("Attempted fullscreen mode via JavaScript")
-                    except Exception:
-                        pass
             except Exception as e:
-                logger.error(f"Error initializing browser: {e}")
+                logger.error("Error initializing browser: %s", e)
                 # Reset initialization state to allow retry
                 self.browser_initialized = False
                 raise
@@ -156,37 +403,350 @@ class PlaywrightTools:
         """Get a page by index, creating one if necessary."""
         if page_index < 0:
             return None
+        if page_index >= self._max_pages:
+            raise ValueError(f"Page index {page_index} exceeds the limit of {self._max_pages} pages")
         
         # Ensure browser is initialized
-        await self._ensure_browser_initialized()
-        
-        # Create new pages if needed
-        while len(self.pages) <= page_index:
-            new_page = await self.context.new_page()
-            # Set up console log listeners
-            new_page.on("console", lambda msg: self.console_logs.append({
-                "type": msg.type,
-                "text": msg.text,
-                "location": msg.location,
-                "time": asyncio.get_event_loop().time()
-            }))
-            self.pages.append(new_page)
-        
-        return self.pages[page_index]
+        if not self.browser_initialized:
+            await self._ensure_browser_initialized()
+        
+        # Pad with empty slots so a sparse index doesn't open a tab for every index before it
+        if len(self.pages) <= page_index:
+            self.pages.extend([None] * (page_index + 1 - len(self.pages)))
+        
+        # Create the page if the slot is empty, or replace one that was closed without us noticing
+        page = self.pages[page_index]
+        if page is None or page.is_closed():
+            try:
+                page = await self.context.new_page()
+            except PlaywrightError as context_error:
+                # Rebuild only what went down, so the other open pages survive a transient error
+                logger.debug("Could not open a new page (%s), recovering the browser context", context_error)
+                try:
+                    return await self._recover_context(page_index)
+                except PlaywrightError as recovery_error:
+                    logger.debug("Could not rebuild the browser context (%s), resetting the browser", recovery_error)
+                    return await self._hard_reset_browser(page_index)
+            self._set_page(page_index, page)
+        
+        return page
+    
+    async def _page_or_error(self, page_index: int) -> tuple:
+        """Get the page for a tool, or the error result to return instead.
+        
+        Returns:
+            (page, None) on success, or (None, error dict) for an invalid or
+            out-of-range page index
+        """
+        try:
+            page = await self._get_page(page_index)
+        except ValueError as e:
+            return None, {"status": "error", "message": str(e)}
+        if not page:
+            return None, {"status": "error", "message": "Invalid page index"}
+        return page, None
+    
+    def _set_page(self, page_index: int, page: Page):
+        """Store a page at page_index, padding with empty slots and attaching the shared listeners."""
+        if page_index >= len(self.pages):
+            self.pages.extend([None] * (page_index + 1 - len(self.pages)))
+        # Set up console log listeners
+        page.on("console", self._on_console)
+        page.on("close", self._on_page_close)
+        page.on("framenavigated", self._on_frame_navigated)
+        self.pages[page_index] = page
+    
+    def _add_page(self, page: Page) -> int:
+        """Store a page in the first free slot and return its index."""
+        index = next((index for index, existing in enumerate(self.pages) if existing is None), len(self.pages))
+        # Check the cap before attaching listeners, so a page that isn't stored isn't referenced
+        if index >= self._max_pages:
+            raise ValueError(f"Cannot open more than {self._max_pages} pages")
+        page.on("close", self._on_page_close)
+        page.on("framenavigated", self._on_frame_navigated)
+        if index == len(self.pages):
+            self.pages.append(page)
+        else:
+            self.pages[index] = page
+        return index
+    
+    def _on_page_close(self, page: Page):
+        """Free the slot of a page once it has been closed."""
+        # Detach the shared listeners so the closed page holds no reference to these tools
+        self._resolved_selectors.pop(page, None)
+        self._iframe_frames.pop(page, None)
+        self._dialog_handlers.pop(page, None)
+        for event, listener in (("console", self._on_console), ("close", self._on_page_close),
+                                ("framenavigated", self._on_frame_navigated)):
+            try:
+                page.remove_listener(event, listener)
+            except Exception:
+                pass
+        for index, existing in enumerate(self.pages):
+            if existing is page:
+                self.pages[index] = None
+                # A page opened in this slot later starts with no logs
+                self._console_by_page.pop(index, None)
+                break
+        # Drop empty slots at the end so len(self.pages) tracks the highest open index
+        while self.pages and self.pages[-1] is None:
+            self.pages.pop()
+    
+    def _install_dialog_handler(self, page: Page, handler: Optional[Callable]):
+        """Replace the page's persistent dialog handler with handler, or just remove it if None."""
+        previous = self._dialog_handlers.pop(page, None)
+        if previous is not None:
+            page.remove_listener("dialog", previous)
+        if handler is not None:
+            page.on("dialog", handler)
+            self._dialog_handlers[page] = handler
+    
+    def _on_frame_navigated(self, frame):
+        """Forget the selectors and iframes resolved on a page once its main frame loads a new document."""
+        if frame.parent_frame is None:
+            self._resolved_selectors.pop(frame.page, None)
+            self._iframe_frames.pop(frame.page, None)
+    
+    async def _launch_browser(self) -> Browser:
+        """Connect to the shared browser at cdp_endpoint if one is set, otherwise launch Chromium."""
+        if self.cdp_endpoint:
+            logger.info("Connecting to browser at %s", self.cdp_endpoint)
+            return await self.playwright.chromium.connect_over_cdp(self.cdp_endpoint)
+        # Note: user_data_dir is not supported in newer versions of Playwright
+        return await self.playwright.chromium.launch(headless=False)
+    
+    async def _new_default_context(self) -> BrowserContext:
+        """Create a browser context with the default viewport and the configured user agent."""
+        return await self.browser.new_context(
+            viewport=_DEFAULT_VIEWPORT,
+            user_agent=self.user_agent
+        )
+    
+    async def _prewarm_context(self):
+        """Create a spare browser context in the background for fast recovery."""
+        if len(self._ctx_pool) >= self._ctx_pool_max:
+            return
+        
+        try:
+            context = await self._new_default_context()
+            self._ctx_pool.append(context)
+        except Exception as e:
+            logger.warning("Could not pre-warm browser context: %s", e)
+    
+    async def _cancel_prewarm(self):
+        """Cancel a pre-warm still in flight and wait for it, so it can't pool a context after a swap."""
+        task, self._prewarm_task = self._prewarm_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def _recover_page(self, page_index: int) -> Optional[Page]:
+        """Recovery step: replace the page at page_index with a fresh page."""
+        if page_index < 0:
+            return None
+        if page_index >= self._max_pages:
+            raise ValueError(f"Page index {page_index} exceeds the limit of {self._max_pages} pages")
+        
+        if not self.browser_initialized:
+            await self._ensure_browser_initialized()
+        
+        page = await self.context.new_page()
+        
+        # Replace or add the page in the pages list
+        self._set_page(page_index, page)
+        logger.debug("New page created at index %s", page_index)
+        
+        # Navigate to a blank page to ensure the page is ready
+        await page.goto("about:blank")
+        return page
+    
+    async def _replace_context(self):
+        """Swap in a new default context and close the old one along with its pages and spares."""
+        await self._cancel_prewarm()
+        stale = [self.context, *self._ctx_pool]
+        self.pages = []
+        self._ctx_pool = []
+        self.context = await self._new_default_context()
+        
+        for result in await asyncio.gather(*(context.close() for context in stale if context),
+                                           return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning("Error closing replaced browser context: %s", result)
+        
+        self._prewarm_task = asyncio.create_task(self._prewarm_context())
+    
+    def _context_is_closed(self) -> bool:
+        """Whether the current browser context is gone (closed, or its browser disconnected)."""
+        if self.context is None or self.browser is None or not self.browser.is_connected():
+            return True
+        # Closed contexts drop out of the browser's list
+        return self.context not in self.browser.contexts
+    
+    async def _recover_context(self, page_index: int) -> Optional[Page]:
+        """Recovery step: replace the browser context if it has closed, then the page."""
+        if not self.browser_initialized:
+            await self._ensure_browser_initialized()
+        
+        # A live context is kept, so its pages don't end up split across two contexts
+        if not self._context_is_closed():
+            logger.debug("Browser context is still open, only replacing the page")
+            return await self._recover_page(page_index)
+        
+        logger.debug("Browser context is closed, creating new context...")
+        await self._cancel_prewarm()
+        stale = self.context
+        # The old context's pages went down with it
+        self.pages = []
+        
+        if self._ctx_pool:
+            self.context = self._ctx_pool.pop()
+            logger.debug("Reusing pre-warmed browser context")
+        else:
+            self.context = await self._new_default_context()
+            logger.debug("Created new browser context")
+        
+        if stale is not None:
+            try:
+                await stale.close()
+            except Exception as e:
+                logger.debug("Error closing the old browser context: %s", e)
+        
+        # Refill the pool for the next recovery
+        self._prewarm_task = asyncio.create_task(self._prewarm_context())
+        return await self._recover_page(page_index)
+    
+    async def _hard_reset_browser(self, page_index: int = 0) -> Page:
+        """Restart Playwright and the browser from scratch, leaving a single fresh page at page_index."""
+        logger.debug("Attempting full browser reset as last resort...")
+        await self._cancel_prewarm()
+        # Both are being thrown away, so close them concurrently
+        shutdown = []
+        if self.browser:
+            shutdown.append(self.browser.close())
+        if self.playwright:
+            shutdown.append(self.playwright.stop())
+        for result in await asyncio.gather(*shutdown, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning("Error shutting down browser during reset: %s", result)
+        
+        # Pooled contexts belonged to the old browser
+        self._ctx_pool = []
+        
+        self.playwright = await async_playwright().start()
+        self.browser = await self._launch_browser()
+        self.context = await self._new_default_context()
+        self.browser_initialized = True
+        
+        page = await self.context.new_page()
+        self.pages = []
+        self._set_page(page_index, page)
+        logger.debug("Browser reset successful")
+        return page
+    
+    async def _full_reset(self, page_index: int) -> Optional[Page]:
+        """Recovery step: restart Playwright and the browser from scratch."""
+        await self._hard_reset_browser()
+        return await self._get_page(page_index)
+    
+    @staticmethod
+    def _retry_delay(attempt: int, base: float = 0.25, cap: float = 8.0, jitter: float = 0.5) -> float:
+        """Exponential backoff delay for a retry, with jitter so parallel retries spread out.
+        
+        Args:
+            attempt: Number of attempts made so far, starting at 1
+            base: Delay in seconds after the first attempt
+            cap: Upper bound on the delay before jitter is applied
+            jitter: Fraction by which the delay is randomly shortened or lengthened
+        """
+        delay = min(cap, base * 2 ** (attempt - 1))
+        return delay * (1 - jitter + 2 * jitter * random.random())
+    
+    @staticmethod
+    def _full_jitter_delay(attempt: int, base: float = 0.05, cap: float = 1.0) -> float:
+        """Full-jitter backoff delay: uniform between 0 and the capped exponential delay.
+        
+        Args:
+            attempt: Number of attempts made so far, starting at 1
+            base: Scale of the exponential delay
+            cap: Upper bound on the delay, never exceeded
+        """
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+    
+    def _now(self) -> float:
+        """Current time on the event loop clock, using the cached loop."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop.time()
+    
+    def _on_console(self, msg: Any):
+        """Page console listener: queue the raw event for the background drainer, dropping it if the queue is full."""
+        try:
+            self._console_raw.put_nowait((msg.type, msg.text, msg.location, msg.page))
+        except asyncio.QueueFull:
+            self._console_dropped += 1
+    
+    def _flush_console(self, first: Optional[tuple] = None, limit: Optional[int] = 256):
+        """Move queued console events into console_logs in a single batch.
+        
+        Args:
+            first: An event already taken off the queue, placed at the start of the batch
+            limit: Maximum batch size, or None to drain everything queued
+        """
+        batch = [first] if first is not None else []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._console_raw.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        if not batch:
+            return
+        
+        # One timestamp and one page index lookup per batch instead of one per event
+        now = self._now()
+        slots = {id(page): index for index, page in enumerate(self.pages) if page is not None}
+        for msg_type, text, location, page in batch:
+            page_index = slots.get(id(page))
+            log = {"type": msg_type, "text": text, "location": location, "time": now, "page_index": page_index}
+            self.console_logs.append(log)
+            if page_index is not None:
+                self._console_by_page[page_index].append(log)
+    
+    async def _drain_console(self):
+        """Background task that batches queued console events into console_logs."""
+        while True:
+            first = await self._console_raw.get()
+            self._flush_console(first)
     
     async def cleanup(self):
         """Cleanup resources but maintain browser persistence."""
         try:
-            # Close pages but keep the browser context and session alive
-            for page in self.pages:
-                if page and not page.is_closed():
-                    try:
-                        await page.close()
-                    except Exception as e:
-                        logger.warning(f"Error closing page: {e}")
+            # Let screenshots still being written finish
+            if self._pending_writes:
+                await asyncio.gather(*self._pending_writes, return_exceptions=True)
+            
+            # Close pages concurrently but keep the browser context and session alive
+            results = await asyncio.gather(
+                *(page.close() for page in self.pages if page and not page.is_closed()),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning("Error closing page: %s", result)
             
             # Clear the pages list but don't close the context or browser
             self.pages = []
+            
+            # Spare contexts are cheap to recreate, so close them but keep the browser.
+            # A pre-warm still running would add one back after the pool is cleared.
+            await self._cancel_prewarm()
+            results = await asyncio.gather(
+                *(context.close() for context in self._ctx_pool),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning("Error closing pooled context: %s", result)
+            self._ctx_pool = []
                 
             if self.browser_initialized:
                 logger.info("Keeping browser session alive")
@@ -197,1305 +757,261 @@ class PlaywrightTools:
             logger.info("Tools cleaned up (browser session remains open for persistence)")
             
         except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
+            logger.error("Error during cleanup: %s", e)
+    
+    async def _visible_selectors(self, page: Page, selectors: tuple) -> List[str]:
+        """Probe selectors concurrently and return the visible ones in their original order."""
+        results = await asyncio.gather(
+            *(page.is_visible(candidate, timeout=1000) for candidate in selectors),
+            return_exceptions=True
+        )
+        return [candidate for candidate, visible in zip(selectors, results) if visible is True]
+    
+    async def _maybe_capture(self, page: Page, tag: str, result: Dict[str, Any], capture: bool) -> None:
+        """Save a screenshot named after tag into result["screenshot"] if capture is set.
+        
+        A failed capture is reported as result["screenshot_error"] rather than failing
+        the action that was just performed.
+        """
+        if not capture:
+            return
+        
+        screenshot_path = self._get_screenshot_path(f"{tag}_{time.monotonic_ns()}.png")
+        try:
+            await self._flush_renderer(page)
+            await self._capture_screenshot(page, screenshot_path, _AUX_SCREENSHOT_TIMEOUT_MS)
+            result["screenshot"] = screenshot_path
+            logger.debug("Screenshot queued for writing to: %s", screenshot_path)
+        except Exception as e:
+            result["screenshot_error"] = str(e)
+    
+    async def _first_visible(self, page: Page, selectors: tuple, timeout: float = 1000) -> Optional[str]:
+        """Race visibility waits for selectors and return the first to become visible, or None.
+        
+        Selectors that become visible together resolve in their original priority order.
+        """
+        order = {candidate: index for index, candidate in enumerate(selectors)}
+        tasks = {
+            asyncio.create_task(page.locator(candidate).first.wait_for(state="visible", timeout=timeout)): candidate
+            for candidate in selectors
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Check every finished task so no exception is left unretrieved; a timeout
+                # or an invalid selector just means that candidate lost
+                won = [task for task in done if not task.cancelled() and task.exception() is None]
+                if won:
+                    return tasks[min(won, key=lambda task: order[tasks[task]])]
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _flush_renderer(self, page: Page) -> None:
+        """Run an empty evaluate so the renderer settles before a screenshot is requested."""
+        try:
+            await page.evaluate("() => {}")
+        except Exception:
+            # The screenshot itself will report a broken page
+            pass
+    
+    async def _viewport_fallback_screenshot(self, page: Page) -> bytes:
+        """Capture just the visible viewport, for when a full capture has timed out."""
+        viewport = page.viewport_size or _DEFAULT_VIEWPORT
+        return await page.screenshot(
+            full_page=False,
+            clip={"x": 0, "y": 0, "width": viewport["width"], "height": viewport["height"]},
+            timeout=_AUX_SCREENSHOT_TIMEOUT_MS
+        )
     
     def _get_screenshot_path(self, filename: str) -> str:
         """Get the full path for a screenshot file."""
         # If filename doesn't have a path, use the screenshot directory
         if not os.path.dirname(filename):
-            return os.path.join(self.screenshot_dir, filename)
+            # Create a screenshots directory if it doesn't exist, and resolve its prefix once
+            if self._screenshot_prefix is None:
+                os.makedirs(self.screenshot_dir, exist_ok=True)
+                logger.info("Screenshots will be saved to: %s", self.screenshot_dir)
+                self._screenshot_prefix = os.path.join(self.screenshot_dir, "")
+            return self._screenshot_prefix + filename
         return filename
     
+    async def _do_screenshot(self, page: Page, full_path: str, selector: str, screenshot_options: Mapping[str, Any],
+                             debug_screenshots: collections.deque, ts: int,
+                             capture_debug: bool = False, timeout: float = 5000) -> None:
+        """Take a single page or element screenshot, raising on failure."""
+        if selector:
+            logger.debug("Taking screenshot of element with selector: %s", selector)
+            element = await page.wait_for_selector(selector, state="visible", timeout=timeout)
+            if not element:
+                raise PlaywrightTimeoutError(f"Element not found: {selector}")
+            
+            # Take a full page screenshot first for context, only when asked for
+            if capture_debug:
+                debug_path = f"element_screenshot_context_{ts}.png"
+                await self._capture_screenshot(page, self._get_screenshot_path(debug_path), _AUX_SCREENSHOT_TIMEOUT_MS)
+                debug_screenshots.append(debug_path)
+                logger.debug("Context screenshot saved to: %s", debug_path)
+            
+            # Now take screenshot of just the element
+            await self._flush_renderer(page)
+            data = await element.screenshot(timeout=_SCREENSHOT_TIMEOUT_MS)
+            await self._write_screenshot(full_path, data)
+            logger.debug("Element screenshot queued for writing to: %s", full_path)
+        else:
+            logger.debug("Taking screenshot of entire page...")
+            await self._flush_renderer(page)
+            try:
+                data = await page.screenshot(**screenshot_options, timeout=_SCREENSHOT_TIMEOUT_MS)
+            except PlaywrightTimeoutError:
+                logger.debug("Page screenshot timed out, capturing the viewport only")
+                data = await self._viewport_fallback_screenshot(page)
+            await self._write_screenshot(full_path, data)
+            logger.debug("Page screenshot queued for writing to: %s", full_path)
+    
+    async def _capture_screenshot(self, page: Page, path: str, timeout: float) -> None:
+        """Take a plain page screenshot and hand it to the background writer."""
+        data = await page.screenshot(timeout=timeout)
+        await self._write_screenshot(path, data)
+    
+    async def _write_screenshot(self, path: str, data: bytes) -> None:
+        """Write screenshot bytes to disk in a worker thread without blocking the caller."""
+        # Apply backpressure once too many writes are in flight
+        if len(self._pending_writes) >= self._max_pending_writes:
+            await asyncio.wait(self._pending_writes, return_when=asyncio.FIRST_COMPLETED)
+        
+        task = asyncio.create_task(asyncio.to_thread(pathlib.Path(path).write_bytes, data))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._on_screenshot_written)
+    
+    def _on_screenshot_written(self, task: asyncio.Task) -> None:
+        """Forget a finished screenshot write and log it if it failed."""
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Error writing screenshot: %s", task.exception())
+    
     # === Code Generation Tool Implementations ===
 
     async def start_codegen_session(self, session_name: str, language: str) -> Dict[str, Any]:
-        """Start a new code generation session."""
-        session_id = f"session_{len(self.codegen_sessions) + 1}"
-        session = CodeGenSession(session_id, session_name, language)
-        self.codegen_sessions[session_id] = session
-        
-        return {
-            "status": "success",
-            "message": f"Code generation session started: {session_name}",
-            "session": session.to_dict()
-        }
-
-    async def end_codegen_session(self, session_id: str) -> Dict[str, Any]:
-        """End a code generation session."""
-        if session_id not in self.codegen_sessions:
-            return {
-                "status": "error",
-                "message": f"Session not found: {session_id}"
-            }
-        
-        session = self.codegen_sessions.pop(session_id)
-        
-        return {
-            "status": "success",
-            "message": f"Code generation session ended: {session.name}",
-            "session": session.to_dict()
-        }
-
-    async def get_codegen_session(self, session_id: str) -> Dict[str, Any]:
-        """Get the current state of a code generation session."""
-        if session_id not in self.codegen_sessions:
-            return {
-                "status": "error",
-                "message": f"Session not found: {session_id}"
-            }
-        
-        session = self.codegen_sessions[session_id]
-        
-        return {
-            "status": "success",
-            "session": session.to_dict()
-        }
-
-    async def clear_codegen_session(self, session_id: str) -> Dict[str, Any]:
-        """Clear a code generation session."""
-        if session_id not in self.codegen_sessions:
-            return {
-                "status": "error",
-                "message": f"Session not found: {session_id}"
-            }
-        
-        session = self.codegen_sessions[session_id]
-        session.update("")
-        
-        return {
-            "status": "success",
-            "message": f"Code generation session cleared: {session.name}",
-            "session": session.to_dict()
-        }
-
-    # === Browser Automation Tool Implementations ===
-
-    async def playwright_navigate(self, url: str, wait_for_load: bool = True, 
-                                 capture_screenshot: bool = False, page_index: int = 0) -> Dict[str, Any]:
-        """Navigate to a URL."""
-        try:
-            # Make sure the URL has http/https prefix
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-                
-            # Get or create the page
-            page = await self._get_page(page_index)
-            if not page:
-                return {"status": "error", "message": "Invalid page index"}
-            
-            try:
-                # Check if page is still valid
-                if not page.is_closed():
-                    print(f"Navigating to {url}...")
-                    if wait_for_load:
-                        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    else:
-                        response = await page.goto(url)
-                        
-                    status = response.status if response else None
-                    
-                    # Get the title and URL after navigation
-                    title = await page.title()
-                    current_url = page.url
-                    
-                    result = {
-                        "status": "success",
-                        "message": f"Navigated to {url}",
-                        "title": title,
-                        "url": current_url
-                    }
-                else:
-                    # Page is closed, create a new one
-                    print("Page is closed, creating a new one...")
-                    page = await self.context.new_page()
-                    self.pages[page_index] = page
-                    
-                    if wait_for_load:
-                        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    else:
-                        response = await page.goto(url)
-                        
-                    status = response.status if response else None
-                    
-                    # Get the title and URL after navigation
-                    title = await page.title()
-                    current_url = page.url
-                    
-                    result = {
-                        "status": "success",
-                        "message": f"Navigated to {url} with new page",
-                        "title": title,
-                        "url": current_url
-                    }
-            except Exception as e:
-                # If the page is closed or any other error, create a new one
-                print(f"Error navigating with existing page: {e}")
-                print("Creating a new page and trying again...")
-                
-                # Create a new page and try again
-                try:
-                    page = await self.context.new_page()
-                    # Replace the page in the pages list
-                    if page_index < len(self.pages):
-                        self.pages[page_index] = page
-                    else:
-                        self.pages.append(page)
-                    
-                    if wait_for_load:
-                        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    else:
-                        response = await page.goto(url)
-                    
-                    status = response.status if response else None
-                    title = await page.title()
-                    current_url = page.url
-                    
-                    result = {
-                        "status": "success",
-                        "message": f"Navigated to {url} with new page (after error)",
-                        "title": title,
-                        "url": current_url
-                    }
-                except Exception as e2:
-                    return {"status": "error", "message": f"Error navigating to {url} even with new page: {str(e2)}"}
-            
-            if capture_screenshot:
-                timestamp = int(asyncio.get_event_loop().time())
-                screenshot_path = self._get_screenshot_path(f"navigation_{timestamp}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
-                
-            return result
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_screenshot(self, filename: str, selector: str = "", page_index: int = 0, 
-                                  full_page: bool = False, omit_background: bool = False, 
-                                  max_attempts: int = 3) -> Dict[str, Any]:
-        """Take a screenshot with enhanced reliability and error recovery.
-        
-        Args:
-            filename: Name of the file to save the screenshot to
-            selector: Optional selector to take screenshot of specific element
-            page_index: Index of the page to screenshot
-            full_page: Whether to take a screenshot of the full page (not just the viewport)
-            omit_background: Whether to hide default white background and allow transparency
-            max_attempts: Maximum number of recovery attempts if errors occur
-        """
-        attempt_count = 0
-        debug_screenshots = []
-        last_error = None
-        
-        while attempt_count < max_attempts:
-            try:
-                attempt_count += 1
-                print(f"Screenshot attempt {attempt_count}/{max_attempts} for '{filename}'")
-                
-                # First ensure playwright and browser are initialized
-                if not self.browser_initialized:
-                    print("Browser not initialized before screenshot, initializing now...")
-                    try:
-                        await self._ensure_browser_initialized()
-                        print("Browser successfully initialized for screenshot")
-                    except Exception as init_error:
-                        print(f"Failed to initialize browser for screenshot: {init_error}")
-                        last_error = init_error
-                        
-                        if attempt_count == max_attempts:
-                            return {
-                                "status": "error", 
-                                "message": f"Browser initialization failed after {max_attempts} attempts: {str(init_error)}",
-                                "debug_screenshots": debug_screenshots
-                            }
-                        else:
-                            # Wait a bit before retrying
-                            await asyncio.sleep(1)
-                            continue
-                
-                # Verify and get a valid page
-                try:
-                    page = await self._get_page(page_index)
-                    if not page:
-                        if attempt_count == max_attempts:
-                            return {"status": "error", "message": "Invalid page index", "debug_screenshots": debug_screenshots}
-                        else:
-                            await asyncio.sleep(1)
-                            continue
-                    
-                    # Check if page is closed or in a problematic state
-                    if page.is_closed():
-                        print(f"Page is closed before screenshot, creating a new page...")
-                        
-                        # Create a new browser context if needed
-                        if not self.context or self.context.is_closed():
-                            print("Browser context is closed, creating new context...")
-                            try:
-                                self.context = await self.browser.new_context(
-                                    viewport={"width": 1425, "height": 776},
-                                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                                )
-                                print("Created new browser context")
-                            except Exception as ctx_err:
-                                print(f"Error creating browser context: {ctx_err}")
-                                last_error = ctx_err
-                                
-                                if attempt_count == max_attempts:
-                                    return {
-                                        "status": "error", 
-                                        "message": f"Browser context creation failed: {str(ctx_err)}",
-                                        "debug_screenshots": debug_screenshots
-                                    }
-                                else:
-                                    # Try to recreate the browser itself
-                                    try:
-                                        print("Attempting to recreate entire browser instance...")
-                                        if self.browser:
-                                            await self.browser.close()
-                                        self.browser = await self.playwright.chromium.launch(headless=False)
-                                        self.context = await self.browser.new_context(
-                                            viewport={"width": 1425, "height": 776}
-                                        )
-                                        self.browser_initialized = True
-                                        print("Browser instance successfully recreated")
-                                    except Exception as browser_err:
-                                        print(f"Failed to recreate browser: {browser_err}")
-                                    
-                                    await asyncio.sleep(1)
-                                    continue
-                        
-                        # Create a new page
-                        try:
-                            print("Creating new page for screenshot...")
-                            page = await self.context.new_page()
-                            
-                            # Replace or add the page in the pages list
-                            if page_index < len(self.pages):
-                                self.pages[page_index] = page
-                            else:
-                                self.pages.append(page)
-                            
-                            print(f"New page created at index {page_index}")
-                            
-                            # Navigate to a blank page to ensure the page is ready
-                            await page.goto("about:blank")
-                            print("Navigated to blank page to initialize page state")
-                        except Exception as page_err:
-                            print(f"Error creating new page: {page_err}")
-                            last_error = page_err
-                            
-                            if attempt_count == max_attempts:
-                                return {
-                                    "status": "error", 
-                                    "message": f"Error creating page: {str(page_err)}",
-                                    "debug_screenshots": debug_screenshots
-                                }
-                            else:
-                                await asyncio.sleep(1)
-                                continue
-                except Exception as page_err:
-                    print(f"Error getting page for screenshot: {page_err}")
-                    last_error = page_err
-                    
-                    if attempt_count == max_attempts:
-                        return {
-                            "status": "error", 
-                            "message": f"Error with page: {str(page_err)}",
-                            "debug_screenshots": debug_screenshots
-                        }
-                    else:
-                        # For recovery on last attempt, try complete browser reset
-                        if attempt_count == max_attempts - 1:
-                            print("Attempting full browser reset as last resort...")
-                            try:
-                                # Close everything and start fresh
-                                if self.browser:
-                                    await self.browser.close()
-                                if self.playwright:
-                                    await self.playwright.stop()
-                                
-                                # Reinitialize playwright
-                                self.playwright = await async_playwright().start()
-                                self.browser = await self.playwright.chromium.launch(headless=False)
-                                self.context = await self.browser.new_context(
-                                    viewport={"width": 1425, "height": 776}
-                                )
-                                self.browser_initialized = True
-                                
-                                # Create a new page
-                                page = await self.context.new_page()
-                                self.pages = [page]
-                                
-                                print("Browser reset successful, retrying screenshot operation...")
-                            except Exception as reset_err:
-                                print(f"Browser reset failed: {reset_err}")
-                        
-                        await asyncio.sleep(1)
-                        continue
-                
-                # Ensure filename has .png extension
-                if not filename.endswith(".png"):
-                    filename += ".png"
-                
-                # Use full path for screenshot
-                full_path = self._get_screenshot_path(filename)
-                
-                # Configure screenshot options
-                screenshot_options = {
-                    "path": full_path,
-                    "full_page": full_page,
-                    "omit_background": omit_background
-                }
-                
-                # Take the screenshot based on whether a selector is provided
-                if selector:
-                    try:
-                        print(f"Taking screenshot of element with selector: {selector}")
-                        element = await page.wait_for_selector(selector, state="visible", timeout=5000)
-                        if not element:
-                            if attempt_count == max_attempts:
-                                return {"status": "error", "message": f"Element not found: {selector}", "debug_screenshots": debug_screenshots}
-                            else:
-                                print(f"Element not found, retrying in next attempt...")
-                                await asyncio.sleep(1)
-                                continue
-                        
-                        # Take a full page screenshot first for context
-                        debug_path = f"element_screenshot_context_{int(time.time())}.png"
-                        await page.screenshot(path=self._get_screenshot_path(debug_path))
-                        debug_screenshots.append(debug_path)
-                        print(f"Context screenshot saved to: {debug_path}")
-                        
-                        # Now take screenshot of just the element
-                        await element.screenshot(path=full_path)
-                        print(f"Element screenshot saved to: {full_path}")
-                    except Exception as e:
-                        print(f"Error taking element screenshot: {e}")
-                        last_error = e
-                        
-                        # Take a full page screenshot anyway for debugging
-                        debug_path = f"debug_failed_selector_{int(time.time())}.png"
-                        try:
-                            await page.screenshot(path=self._get_screenshot_path(debug_path))
-                            debug_screenshots.append(debug_path)
-                            print(f"Debug screenshot after element selection failure: {debug_path}")
-                        except Exception as debug_error:
-                            print(f"Failed to take debug screenshot: {debug_error}")
-                        
-                        if attempt_count == max_attempts:
-                            return {
-                                "status": "error", 
-                                "message": f"Error taking screenshot of element after {max_attempts} attempts: {str(e)}",
-                                "debug_screenshots": debug_screenshots,
-                                "selector": selector
-                            }
-                        else:
-                            # Try waiting longer for the element in next attempt
-                            await asyncio.sleep(1)
-                            continue
-                else:
-                    try:
-                        print(f"Taking screenshot of entire page...")
-                        await page.screenshot(**screenshot_options)
-                        print(f"Page screenshot saved to: {full_path}")
-                    except Exception as e:
-                        print(f"Error taking page screenshot: {e}")
-                        last_error = e
-                        
-                        if attempt_count == max_attempts:
-                            # Try with minimal options on last attempt
-                            try:
-                                print("Attempting screenshot with minimal options as last resort...")
-                                minimal_path = self._get_screenshot_path(f"minimal_fallback_{int(time.time())}.png")
-                                await page.screenshot(path=minimal_path)
-                                
-                                # If successful, we'll use this as our result
-                                print(f"Minimal screenshot succeeded and saved to: {minimal_path}")
-                                return {
-                                    "status": "success",
-                                    "message": f"Screenshot saved to {minimal_path} (using fallback method)",
-                                    "filename": minimal_path,
-                                    "used_fallback": True
-                                }
-                            except Exception as minimal_err:
-                                print(f"Even minimal screenshot failed: {minimal_err}")
-                                return {
-                                    "status": "error", 
-                                    "message": f"Error taking page screenshot after {max_attempts} attempts: {str(e)}",
-                                    "debug_screenshots": debug_screenshots
-                                }
-                        else:
-                            # Try with different options next time
-                            if attempt_count == 1:
-                                # On first failure, try without full_page
-                                full_page = False 
-                                print("Will retry without full_page option")
-                            elif attempt_count == 2:
-                                # On second failure, try without any options
-                                omit_background = False
-                                print("Will retry with minimal options")
-                                
-                            await asyncio.sleep(1)
-                            continue
-                
-                # If we reached here, the screenshot was successful
-                return {
-                    "status": "success",
-                    "message": f"Screenshot saved to {full_path}",
-                    "filename": full_path,
-                    "attempts": attempt_count,
-                    "debug_screenshots": debug_screenshots
-                }
-                
-            except Exception as e:
-                print(f"Unexpected error in screenshot function: {e}")
-                last_error = e
-                
-                # On final attempt, try emergency screenshot
-                if attempt_count == max_attempts:
-                    try:
-                        # One last desperate attempt
-                        emergency_path = self._get_screenshot_path(f"emergency_{int(time.time())}.png")
-                        if page and not page.is_closed():
-                            await page.screenshot(path=emergency_path)
-                            return {
-                                "status": "partial_success",
-                                "message": f"Screenshot saved with emergency fallback: {emergency_path}",
-                                "filename": emergency_path,
-                                "original_error": str(e),
-                                "debug_screenshots": debug_screenshots
-                            }
-                    except Exception:
-                        pass
-                    
-                    return {
-                        "status": "error", 
-                        "message": f"Screenshot failed after {max_attempts} attempts: {str(e)}",
-                        "debug_screenshots": debug_screenshots
-                    }
-                
-                await asyncio.sleep(1)
-                continue
-
-    async def playwright_click(self, selector: str, page_index: int = 0, 
-                              capture_screenshot: bool = False) -> Dict[str, Any]:
-        """Click on an element."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Common selectors for cookie accept buttons if the given selector doesn't work
-            common_cookie_selectors = [
-                selector,  # Try the provided selector first
-                "#accept-cookies", 
-                ".cookie-accept", 
-                "[aria-label='Accept cookies']", 
-                "[aria-label='Accept All']",
-                "[aria-label='Accept all']",
-                "button:has-text('Accept')",
-                "button:has-text('Accept All')",
-                "button:has-text('Accept all')",
-                "button:has-text('I accept')",
-                "button:has-text('Allow all')",
-                "button:has-text('Allow cookies')"
-            ]
-            
-            # If this is likely a cookie consent button
-            if "cookie" in selector.lower() or "accept" in selector.lower() or "consent" in selector.lower():
-                print(f"Looks like a cookie button. Trying various selectors...")
-                
-                # Try each selector
-                for cookie_selector in common_cookie_selectors:
-                    try:
-                        print(f"Trying selector: {cookie_selector}")
-                        # Wait a short time for each selector
-                        is_visible = await page.is_visible(cookie_selector, timeout=1000)
-                        if is_visible:
-                            print(f"Found visible element with selector: {cookie_selector}")
-                            await page.click(cookie_selector)
-                            
-                            result = {
-                                "status": "success",
-                                "message": f"Clicked on {cookie_selector}"
-                            }
-                            
-                            if capture_screenshot:
-                                screenshot_path = self._get_screenshot_path(f"click_{asyncio.get_event_loop().time()}.png")
-                                await page.screenshot(path=screenshot_path)
-                                result["screenshot"] = screenshot_path
-                                print(f"Screenshot saved to: {screenshot_path}")
-                                
-                            return result
-                    except Exception as selector_error:
-                        # Continue to the next selector
-                        continue
-                
-                # If we get here, none of the selectors worked
-                return {"status": "error", "message": f"Could not find any cookie consent button to click"}
-            
-            # For non-cookie buttons, just use the provided selector
-            print(f"Waiting for selector to be visible: {selector}")
-            await page.wait_for_selector(selector, state="visible")
-            await page.click(selector)
-            
-            result = {
-                "status": "success",
-                "message": f"Clicked on {selector}"
-            }
-            
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"click_{asyncio.get_event_loop().time()}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
-                
-            return result
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_click_and_switch_tab(self, selector: str, page_index: int = 0,
-                                            capture_screenshot: bool = False) -> Dict[str, Any]:
-        """Click on an element that opens a new tab and switch to it."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Wait for the element to be visible
-            await page.wait_for_selector(selector, state="visible")
-            
-            # Get the current number of pages
-            initial_pages_count = len(self.pages)
-            
-            # Start listening for new pages
-            async with page.expect_popup() as popup_info:
-                await page.click(selector)
-            
-            # Get the new page
-            new_page = await popup_info.value
-            self.pages.append(new_page)
-            new_page_index = len(self.pages) - 1
-            
-            # Set up console log listeners for the new page
-            new_page.on("console", lambda msg: self.console_logs.append({
-                "type": msg.type,
-                "text": msg.text,
-                "location": msg.location,
-                "time": asyncio.get_event_loop().time()
-            }))
-            
-            # Wait for the new page to load
-            await new_page.wait_for_load_state("networkidle")
-            
-            result = {
-                "status": "success",
-                "message": f"Clicked on {selector} and switched to new tab",
-                "new_page_index": new_page_index,
-                "title": await new_page.title(),
-                "url": new_page.url
-            }
-            
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"new_tab_{asyncio.get_event_loop().time()}.png")
-                await new_page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
-            
-            return result
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_iframe_click(self, iframe_selector: str, element_selector: str,
-                                     page_index: int = 0, capture_screenshot: bool = False) -> Dict[str, Any]:
-        """Click on an element inside an iframe."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Wait for iframe
-            iframe = await page.wait_for_selector(iframe_selector)
-            if not iframe:
-                return {"status": "error", "message": f"Iframe not found: {iframe_selector}"}
-            
-            # Get the content frame
-            frame = await iframe.content_frame()
-            if not frame:
-                return {"status": "error", "message": "Could not access iframe content"}
-            
-            # Click the element within the iframe
-            await frame.wait_for_selector(element_selector, state="visible")
-            await frame.click(element_selector)
-            
-            result = {
-                "status": "success",
-                "message": f"Clicked on {element_selector} inside iframe {iframe_selector}"
-            }
-            
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"iframe_click_{asyncio.get_event_loop().time()}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
-            
-            return result
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_hover(self, selector: str, page_index: int = 0,
-                              capture_screenshot: bool = False) -> Dict[str, Any]:
-        """Hover over an element."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            await page.wait_for_selector(selector, state="visible")
-            await page.hover(selector)
-            
-            result = {
-                "status": "success",
-                "message": f"Hovered over {selector}"
-            }
-            
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"hover_{asyncio.get_event_loop().time()}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
-            
-            return result
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_fill(self, selector: str, text: str, page_index: int = 0) -> Dict[str, Any]:
-        """Fill a form field."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # First attempt - standard fill approach
-            try:
-                await page.wait_for_selector(selector, state="visible", timeout=5000)
-                await page.fill(selector, text)
-                
-                return {
-                    "status": "success",
-                    "message": f"Filled {selector} with text",
-                    "strategy_used": "standard_fill"
-                }
-            except PlaywrightTimeoutError:
-                # If standard approach fails, try the next approach
-                logger.info(f"Standard fill approach failed for '{selector}', trying with multi-strategy locate")
-                
-                # Try with multi-strategy locate
-                multi_strategy_result = await self.playwright_multi_strategy_locate(
-                    description=f"input field {selector.replace('[name=', '').replace(']', '')}",
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
-                
-                if multi_strategy_result["status"] == "success":
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using multi-strategy approach",
-                        "strategy_used": "multi_strategy",
-                        "details": multi_strategy_result
-                    }
-                
-                # Try with vision locator 
-                logger.info(f"Multi-strategy approach failed, trying with vision locator")
-                vision_result = await self.playwright_vision_locator(
-                    text="search", 
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
-                
-                if vision_result["status"] == "success":
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using vision locator",
-                        "strategy_used": "vision_locator",
-                        "details": vision_result
-                    }
-                
-                # Try with accessibility tree
-                logger.info(f"Vision locator approach failed, trying with accessibility tree")
-                a11y_result = await self.playwright_accessibility_locator(
-                    description=f"search input field",
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
-                
-                if a11y_result["status"] == "success" and a11y_result.get("element_found"):
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using accessibility locator",
-                        "strategy_used": "accessibility_locator",
-                        "details": a11y_result
-                    }
-                
-                # Try with JavaScript evaluate as last resort
-                logger.info(f"All specialized locators failed, trying with JavaScript as last resort")
-                js_result = await self.playwright_js_locate(
-                    description=f"search input",
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
-                
-                if js_result["status"] == "success" and js_result.get("element_found"):
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using JavaScript locator",
-                        "strategy_used": "js_locate",
-                        "details": js_result
-                    }
-                
-                # If all approaches fail, try some common selectors for search inputs
-                common_search_selectors = [
-                    "input[type='search']",
-                    "input[type='text']",
-                    "input.search-box",
-                    "input.searchbox",
-                    "input.gLFyf",  # Google search class
-                    ".search-input",
-                    "#search-input",
-                    "[aria-label='Search']",
-                    "[placeholder*='Search']",
-                    "[placeholder*='search']"
-                ]
-                
-                for common_selector in common_search_selectors:
-                    try:
-                        if await page.is_visible(common_selector, timeout=1000):
-                            await page.fill(common_selector, text)
-                            return {
-                                "status": "success",
-                                "message": f"Filled {common_selector} with text using common selector patterns",
-                                "strategy_used": "common_selectors"
-                            }
-                    except Exception:
-                        continue
-                
-                # If we reach here, all approaches failed
-                return {
-                    "status": "error",
-                    "message": f"Failed to fill text. All approaches failed.",
-                    "selector_tried": selector,
-                    "text": text
-                }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_select(self, selector: str, value: str, page_index: int = 0) -> Dict[str, Any]:
-        """Select an option from a dropdown."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            await page.wait_for_selector(selector, state="visible")
-            await page.select_option(selector, value)
-            
-            return {
-                "status": "success",
-                "message": f"Selected value '{value}' in {selector}"
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_evaluate(self, script: str, page_index: int = 0) -> Dict[str, Any]:
-        """Evaluate JavaScript in the page context."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            result = await page.evaluate(script)
-            
-            return {
-                "status": "success",
-                "result": result
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_console_logs(self, page_index: int = 0, count: int = 10) -> Dict[str, Any]:
-        """Get console logs from the page."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Get the most recent logs for this page
-            page_logs = [log for log in self.console_logs if log.get("page_index", 0) == page_index]
-            recent_logs = page_logs[-count:] if count < len(page_logs) else page_logs
-            
-            return {
-                "status": "success",
-                "logs": recent_logs
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_close(self, page_index: int = 0) -> Dict[str, Any]:
-        """Close a page."""
-        if page_index < 0 or page_index >= len(self.pages):
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Close the page
-            await self.pages[page_index].close()
-            
-            # Remove from list
-            self.pages.pop(page_index)
-            
-            return {
-                "status": "success",
-                "message": f"Closed page at index {page_index}",
-                "remaining_pages": len(self.pages)
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_expect_response(self, url_pattern: str, timeout_ms: int = 30000,
-                                        page_index: int = 0) -> Dict[str, Any]:
-        """Wait for a specific HTTP response."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Wait for response
-            async with page.expect_response(url_pattern, timeout=timeout_ms) as response_info:
-                response = await response_info.value
-            
-            # Get response details
-            status = response.status
-            headers = await response.all_headers()
-            
-            return {
-                "status": "success",
-                "message": f"Received response from {response.url}",
-                "response_status": status,
-                "headers": headers
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_assert_response(self, url_pattern: str, status_code: int = 200,
-                                        page_index: int = 0) -> Dict[str, Any]:
-        """Assert that a response matches expectations."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Create a callback to collect the responses
-            matching_responses = []
-            
-            def handle_response(response):
-                if url_pattern in response.url:
-                    matching_responses.append(response)
-            
-            # Start listening for responses
-            page.on("response", handle_response)
-            
-            # Wait a bit to collect responses
-            await asyncio.sleep(2)
-            
-            # Stop listening
-            page.remove_listener("response", handle_response)
-            
-            # Check matches
-            if not matching_responses:
-                return {
-                    "status": "error",
-                    "message": f"No responses matching {url_pattern} found"
-                }
-            
-            # Check status codes
-            success = all(response.status == status_code for response in matching_responses)
-            
-            return {
-                "status": "success" if success else "error",
-                "message": f"Response assertion {'passed' if success else 'failed'}",
-                "expected_status": status_code,
-                "actual_statuses": [response.status for response in matching_responses],
-                "urls": [response.url for response in matching_responses]
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_custom_user_agent(self, user_agent: str, page_index: int = 0) -> Dict[str, Any]:
-        """Set a custom user agent."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            await page.set_extra_http_headers({"User-Agent": user_agent})
-            
-            return {
-                "status": "success",
-                "message": f"Set custom user agent: {user_agent}"
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_get_visible_text(self, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
-        """Get visible text from the page."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            text = await page.text_content(selector)
-            
-            return {
-                "status": "success",
-                "text": text
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_get_visible_html(self, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
-        """Get visible HTML from the page."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            html = await page.inner_html(selector)
-            
-            return {
-                "status": "success",
-                "html": html
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_go_back(self, page_index: int = 0) -> Dict[str, Any]:
-        """Navigate back in the browser history."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            await page.go_back()
-            await page.wait_for_load_state("networkidle")
-            
-            return {
-                "status": "success",
-                "message": "Navigated back",
-                "title": await page.title(),
-                "url": page.url
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_go_forward(self, page_index: int = 0) -> Dict[str, Any]:
-        """Navigate forward in the browser history."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            await page.go_forward()
-            await page.wait_for_load_state("networkidle")
-            
-            return {
-                "status": "success",
-                "message": "Navigated forward",
-                "title": await page.title(),
-                "url": page.url
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_drag(self, source_selector: str, target_selector: str,
-                             page_index: int = 0) -> Dict[str, Any]:
-        """Drag an element to another position."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Wait for elements
-            await page.wait_for_selector(source_selector, state="visible")
-            await page.wait_for_selector(target_selector, state="visible")
-            
-            # Perform drag and drop
-            await page.drag_and_drop(source_selector, target_selector)
-            
-            return {
-                "status": "success",
-                "message": f"Dragged {source_selector} to {target_selector}"
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_press_key(self, key: str, page_index: int = 0) -> Dict[str, Any]:
-        """Press a key."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            await page.keyboard.press(key)
-            
-            return {
-                "status": "success",
-                "message": f"Pressed key: {key}"
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-    async def playwright_save_as_pdf(self, filename: str, page_index: int = 0) -> Dict[str, Any]:
-        """Save the page as PDF."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            if not filename.endswith(".pdf"):
-                filename += ".pdf"
-            
-            await page.pdf(path=filename)
-            
-            return {
-                "status": "success",
-                "message": f"Saved page as PDF: {filename}",
-                "filename": filename
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-            
-    async def playwright_smart_click(self, text=None, selector=None, element_type: str = 'any', page_index: int = 0,
-                                   capture_screenshot: bool = False, max_attempts: int = 3) -> Dict[str, Any]:
-        """
-        Smart click that tries multiple selector strategies based on fuzzy text matching.
-        Especially useful for common UI patterns with varied terminology.
-        
-        Args:
-            text: The text to look for (e.g., "Place Order", "Continue", "Submit")
-            selector: Alternative to text - CSS selector to click (for compatibility with LLM output)
-            element_type: Type of element to target ('button', 'link', 'any')
-            page_index: Index of the page to operate on
-            capture_screenshot: Whether to capture a screenshot after clicking
-            max_attempts: Maximum number of attempts to try different strategies
-        """
-        # Handle cases where selector is provided instead of text (for compatibility with LLM output)
-        if selector is not None and text is None:
-            # Try to extract text from the selector
-            import re
-            
-            # Common patterns for selector with text
-            has_text_match = re.search(r":has-text\('([^']+)'\)", selector)
-            if has_text_match:
-                text = has_text_match.group(1)
-                print(f"Extracted text '{text}' from selector '{selector}'")
-            elif ":text(" in selector:
-                text_match = re.search(r":text\(['\"]([^'\"]+)['\"]\)", selector)
-                if text_match:
-                    text = text_match.group(1)
-                    print(f"Extracted text '{text}' from selector '{selector}'")
-            elif "aria-label" in selector:
-                label_match = re.search(r"\[aria-label=['\"]([^'\"]+)['\"]\]", selector)
-                if label_match:
-                    text = label_match.group(1)
-                    print(f"Extracted text '{text}' from selector '{selector}'")
-            else:
-                # If we couldn't extract text, use the selector as the text
-                text = selector
-                print(f"Using selector '{selector}' as text")
-        
-        # Ensure we have text to click
-        if text is None:
-            return {"status": "error", "message": "Either text or selector must be provided"}
-            
-        # Track where we are in the recovery process
-        attempt_count = 0
-        last_error = None
-        debug_screenshots = []
-        page = None
-        
-        while attempt_count < max_attempts:
-            attempt_count += 1
-            print(f"Smart click attempt {attempt_count}/{max_attempts} for text: '{text}'")
-            
-            try:
-                # Ensure browser is initialized
-                if not self.browser_initialized:
-                    print(f"Browser not initialized before smart_click, initializing now...")
-                    await self._ensure_browser_initialized()
-                    print(f"Browser initialized successfully for smart_click")
-                
-                # Get the page
-                page = await self._get_page(page_index)
-                if not page:
-                    return {"status": "error", "message": "Invalid page index"}
-                
-                # Extra validation for the page object
-                if page.is_closed():
-                    print("Page is closed, creating a new page...")
-                    page = await self.context.new_page()
-                    self.pages[page_index] = page
-                    print(f"Created new page at index {page_index}")
-                
-                print(f"Smart click looking for element with text: {text}")
-                
-                # Create variations of the text for fuzzy matching
-                text_variations = [
-                    text,
-                    text.lower(),
-                    text.upper(),
-                    text.title(),
-                ]
-                
-                # Generate selectors based on element type
-                selectors = []
-                
-                if element_type == "button" or element_type == "any":
-                    # Button selectors
-                    for variation in text_variations:
-                        selectors.extend([
-                            f"button:has-text('{variation}')",
-                            f"button[value='{variation}']",
-                            f"input[type='submit'][value='{variation}']",
-                            f"[role='button']:has-text('{variation}')",
-                        ])
-                
-                if element_type == "link" or element_type == "any":
-                    # Link selectors
-                    for variation in text_variations:
-                        selectors.extend([
-                            f"a:has-text('{variation}')",
-                            f"[role='link']:has-text('{variation}')"
-                        ])
-                
-                if element_type == "any":
-                    # General selectors for any clickable element
-                    for variation in text_variations:
-                        selectors.extend([
-                            f":has-text('{variation}'):visible",
-                            f"[aria-label='{variation}']",
-                            f"[title='{variation}']",
-                        ])
-                
-                # Also add the original selector if it was provided
-                if selector is not None:
-                    selectors.insert(0, selector)  # Try the exact selector first
-                
-                # Try each selector
-                for selector in selectors:
-                    try:
-                        if await page.is_visible(selector, timeout=1000):
-                            print(f"Smart click found element with selector: {selector}")
-                            await page.click(selector)
-                            
-                            result = {
-                                "status": "success",
-                                "message": f"Smart click succeeded with selector: {selector}",
-                                "matched_text": text,
-                                "selector_used": selector
-                            }
-                            
-                            if capture_screenshot:
-                                screenshot_path = self._get_screenshot_path(f"smart_click_{int(asyncio.get_event_loop().time())}.png")
-                                await page.screenshot(path=screenshot_path)
-                                result["screenshot"] = screenshot_path
-                                print(f"Screenshot saved to: {screenshot_path}")
-                                
-                            return result
-                    except Exception:
-                        # Continue to next selector if this one fails
-                        continue
-                
-                # If we reached this point and haven't returned, none of the selectors worked
-                if attempt_count == max_attempts:
-                    error_result = {
-                        "status": "error", 
-                        "message": f"Smart click failed: Could not find clickable element matching '{text}'",
-                        "tried_selectors": selectors[:5]  # Return first few selectors tried (limit result size)
-                    }
-                    
-                    # Take a screenshot of the failure state for debugging
-                    if capture_screenshot:
-                        try:
-                            failure_screenshot = f"smart_click_failure_{int(asyncio.get_event_loop().time())}.png"
-                            await page.screenshot(path=self._get_screenshot_path(failure_screenshot))
-                            error_result["failure_screenshot"] = failure_screenshot
-                            print(f"Failure screenshot saved to: {failure_screenshot}")
-                        except Exception:
-                            pass
-                        
-                    return error_result
-            
-            except Exception as e:
-                print(f"Error in playwright_smart_click attempt {attempt_count}: {str(e)}")
-                last_error = e
-                
-                # If this is the last attempt, return an error
-                if attempt_count == max_attempts:
-                    error_info = {
-                        "status": "error", 
-                        "message": f"Smart click failed after {max_attempts} attempts: {str(e)}",
-                        "tried_text": text,
-                        "tried_element_type": element_type
-                    }
-                    
-                    # Try to include page info and screenshot for debugging
-                    if page and not page.is_closed():
-                        try:
-                            error_info["page_url"] = page.url
-                            error_info["page_title"] = await page.title()
-                            
-                            if capture_screenshot:
-                                error_screenshot = f"smart_click_error_{int(asyncio.get_event_loop().time())}.png"
-                                await page.screenshot(path=self._get_screenshot_path(error_screenshot))
-                                error_info["error_screenshot"] = error_screenshot
-                        except Exception:
-                            pass
-                    
-                    return error_info
-                
-                # Otherwise, wait a bit and try again
-                await asyncio.sleep(1)
-                continue
+        """Start a new code generation session."""
+        session_id = f"session_{next(self._codegen_counter)}"
+        session = CodeGenSession(session_id, session_name, language, now=self._now)
+        self.codegen_sessions[session_id] = session
+        
+        return {
+            "status": "success",
+            "message": f"Code generation session started: {session_name}",
+            "session": session.to_dict()
+        }
+
+    async def end_codegen_session(self, session_id: str) -> Dict[str, Any]:
+        """End a code generation session."""
+        if session_id not in self.codegen_sessions:
+            return {
+                "status": "error",
+                "message": f"Session not found: {session_id}"
+            }
+        
+        session = self.codegen_sessions.pop(session_id)
+        
+        return {
+            "status": "success",
+            "message": f"Code generation session ended: {session.name}",
+            "session": session.to_dict()
+        }
+
+    async def get_codegen_session(self, session_id: str) -> Dict[str, Any]:
+        """Get the current state of a code generation session."""
+        if session_id not in self.codegen_sessions:
+            return {
+                "status": "error",
+                "message": f"Session not found: {session_id}"
+            }
+        
+        session = self.codegen_sessions[session_id]
+        
+        return {
+            "status": "success",
+            "session": session.to_dict()
+        }
+
+    async def clear_codegen_session(self, session_id: str) -> Dict[str, Any]:
+        """Clear a code generation session."""
+        if session_id not in self.codegen_sessions:
+            return {
+                "status": "error",
+                "message": f"Session not found: {session_id}"
+            }
+        
+        session = self.codegen_sessions[session_id]
+        session.update("")
+        
+        return {
+            "status": "success",
+            "message": f"Code generation session cleared: {session.name}",
+            "session": session.to_dict()
+        }
+
+    # === Browser Automation Tool Implementations ===
+
+    async def _wait_for_load(self, page: Page, wait_for_networkidle: bool = False) -> None:
+        """Wait for the DOM to be ready, and optionally for the network to go idle.
+        
+        Args:
+            page: Page to wait on
+            wait_for_networkidle: Also wait for network idle, giving up quietly after 10 seconds
+        """
+        await page.wait_for_load_state("domcontentloaded")
+        if wait_for_networkidle:
+            try:
+                await asyncio.wait_for(page.wait_for_load_state("networkidle"), timeout=10)
+            except (asyncio.TimeoutError, PlaywrightTimeoutError):
+                logger.debug("Network did not go idle within 10 seconds, continuing")
+    
+    async def _goto_and_describe(self, page: Page, url: str, wait_for_load: bool,
+                                 include_title: bool, include_metadata: bool = True) -> Dict[str, Any]:
+        """Navigate a page and describe where it ended up."""
+        if wait_for_load:
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        else:
+            response = await page.goto(url)
+        
+        # Callers that only need the page loaded can skip describing it
+        if not include_metadata:
+            return {}
+        
+        details = {
+            "url": page.url,
+            "response_status": response.status if response else None
+        }
+        
+        # The title costs an extra round-trip to the browser, so only fetch it on request
+        if include_title:
+            details["title"] = await page.title()
+        
+        return details
 
     async def playwright_navigate(self, url: str, wait_for_load: bool = True, 
-                                 capture_screenshot: bool = False, page_index: int = 0) -> Dict[str, Any]:
-        """Navigate to a URL."""
+                                 capture_screenshot: bool = False, page_index: int = 0,
+                                 include_title: bool = False,
+                                 include_metadata: bool = True) -> Dict[str, Any]:
+        """Navigate to a URL.
+        
+        Args:
+            url: URL to navigate to (https:// is assumed when no scheme is given)
+            wait_for_load: Whether to wait for DOMContentLoaded
+            capture_screenshot: Whether to capture a screenshot after navigating
+            page_index: Index of the page to navigate
+            include_title: Whether to include the page title in the result
+            include_metadata: Whether to include the final URL, response status and
+                (with include_title) the title; pass False when only the load matters
+        """
         try:
             # Make sure the URL has http/https prefix
-            if not url.startswith(('http://', 'https://')):
+            if not url.startswith(_URL_SCHEMES):
                 url = 'https://' + url
                 
             # Get or create the page
@@ -1504,88 +1020,39 @@ class PlaywrightTools:
                 return {"status": "error", "message": "Invalid page index"}
             
             try:
-                # Check if page is still valid
+                logger.debug("Navigating to %s...", url)
+                message = f"Navigated to {url}"
+                details = await self._goto_and_describe(page, url, wait_for_load, include_title,
+                                                        include_metadata)
+            except PlaywrightError as e:
+                # Only a closed page is worth retrying; other errors would just repeat.
+                # Network errors such as net::ERR_CONNECTION_CLOSED leave the page open.
                 if not page.is_closed():
-                    print(f"Navigating to {url}...")
-                    if wait_for_load:
-                        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    else:
-                        response = await page.goto(url)
-                        
-                    status = response.status if response else None
-                    
-                    # Get the title and URL after navigation
-                    title = await page.title()
-                    current_url = page.url
-                    
-                    result = {
-                        "status": "success",
-                        "message": f"Navigated to {url}",
-                        "title": title,
-                        "url": current_url
-                    }
-                else:
-                    # Page is closed, create a new one
-                    print("Page is closed, creating a new one...")
-                    page = await self.context.new_page()
-                    self.pages[page_index] = page
-                    
-                    if wait_for_load:
-                        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    else:
-                        response = await page.goto(url)
-                        
-                    status = response.status if response else None
-                    
-                    # Get the title and URL after navigation
-                    title = await page.title()
-                    current_url = page.url
-                    
-                    result = {
-                        "status": "success",
-                        "message": f"Navigated to {url} with new page",
-                        "title": title,
-                        "url": current_url
-                    }
-            except Exception as e:
-                # If the page is closed or any other error, create a new one
-                print(f"Error navigating with existing page: {e}")
-                print("Creating a new page and trying again...")
+                    return {"status": "error", "message": f"Error navigating to {url}: {str(e)}"}
+                
+                logger.debug("Error navigating with existing page: %s", e)
+                logger.debug("Creating a new page and trying again...")
                 
                 # Create a new page and try again
                 try:
                     page = await self.context.new_page()
                     # Replace the page in the pages list
-                    if page_index < len(self.pages):
-                        self.pages[page_index] = page
-                    else:
-                        self.pages.append(page)
-                    
-                    if wait_for_load:
-                        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                    else:
-                        response = await page.goto(url)
-                    
-                    status = response.status if response else None
-                    title = await page.title()
-                    current_url = page.url
+                    self._set_page(page_index, page)
                     
-                    result = {
-                        "status": "success",
-                        "message": f"Navigated to {url} with new page (after error)",
-                        "title": title,
-                        "url": current_url
-                    }
+                    message = f"Navigated to {url} with new page (after error)"
+                    details = await self._goto_and_describe(page, url, wait_for_load, include_title,
+                                                            include_metadata)
                 except Exception as e2:
                     return {"status": "error", "message": f"Error navigating to {url} even with new page: {str(e2)}"}
             
-            if capture_screenshot:
-                timestamp = int(asyncio.get_event_loop().time())
-                screenshot_path = self._get_screenshot_path(f"navigation_{timestamp}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
-                
+            result = {
+                "status": "success",
+                "message": message,
+                **details
+            }
+            
+            await self._maybe_capture(page, "navigation", result, capture_screenshot)
+            
             return result
             
         except Exception as e:
@@ -1593,7 +1060,8 @@ class PlaywrightTools:
 
     async def playwright_screenshot(self, filename: str, selector: str = "", page_index: int = 0, 
                                   full_page: bool = False, omit_background: bool = False, 
-                                  max_attempts: int = 3) -> Dict[str, Any]:
+                                  max_attempts: int = 3, capture_debug: bool = False,
+                                  max_total_ms: int = 5000) -> Dict[str, Any]:
         """Take a screenshot with enhanced reliability and error recovery.
         
         Args:
@@ -1603,361 +1071,188 @@ class PlaywrightTools:
             full_page: Whether to take a screenshot of the full page (not just the viewport)
             omit_background: Whether to hide default white background and allow transparency
             max_attempts: Maximum number of recovery attempts if errors occur
+            capture_debug: Whether to also save a full page context screenshot before an element screenshot
+            max_total_ms: Total time in milliseconds to wait for the selector across all attempts
         """
-        attempt_count = 0
-        debug_screenshots = []
+        # Ensure filename has .png extension
+        if not filename.endswith(".png"):
+            filename += ".png"
+        
+        # Use full path for screenshot
+        full_path = self._get_screenshot_path(filename)
+        
+        # Page screenshot options; the shared defaults unless the caller asked for more
+        if full_page or omit_background:
+            screenshot_options = {"full_page": full_page, "omit_background": omit_background}
+        else:
+            screenshot_options = _DEFAULT_SS_OPTS
+        
+        # One timestamp names every debug file written by this call
+        ts = time.monotonic_ns()
+        # Selector waits share one budget across attempts instead of 5s each
+        deadline = self._now() + max_total_ms / 1000
+        # Only the most recent debug captures are reported, however many attempts fail
+        debug_screenshots = collections.deque(maxlen=5)
         last_error = None
+        page = None
+        needs_recovery = True
         
-        while attempt_count < max_attempts:
+        # Recovery steps in escalating order. A step only runs when there is no usable
+        # page, so a missing element is retried on the same page.
+        recovery_steps = (self._get_page, self._recover_page, self._recover_context, self._full_reset)
+        step = 0
+        
+        for attempt_count in range(1, max_attempts + 1):
+            logger.debug("Screenshot attempt %s/%s for '%s'", attempt_count, max_attempts, filename)
+            
             try:
-                attempt_count += 1
-                print(f"Screenshot attempt {attempt_count}/{max_attempts} for '{filename}'")
-                
-                # First ensure playwright and browser are initialized
-                if not self.browser_initialized:
-                    print("Browser not initialized before screenshot, initializing now...")
-                    try:
-                        await self._ensure_browser_initialized()
-                        print("Browser successfully initialized for screenshot")
-                    except Exception as init_error:
-                        print(f"Failed to initialize browser for screenshot: {init_error}")
-                        last_error = init_error
-                        
-                        if attempt_count == max_attempts:
-                            return {
-                                "status": "error", 
-                                "message": f"Browser initialization failed after {max_attempts} attempts: {str(init_error)}",
-                                "debug_screenshots": debug_screenshots
-                            }
-                        else:
-                            # Wait a bit before retrying
-                            await asyncio.sleep(1)
-                            continue
-                
-                # Verify and get a valid page
-                try:
-                    page = await self._get_page(page_index)
+                # A closed page shows up as an error from the screenshot call, so the
+                # page is only replaced after such a failure rather than checked upfront
+                if needs_recovery:
+                    recover = recovery_steps[step]
+                    step = min(step + 1, len(recovery_steps) - 1)
+                    page = await recover(page_index)
                     if not page:
-                        if attempt_count == max_attempts:
-                            return {"status": "error", "message": "Invalid page index", "debug_screenshots": debug_screenshots}
-                        else:
-                            await asyncio.sleep(1)
-                            continue
-                    
-                    # Check if page is closed or in a problematic state
-                    if page.is_closed():
-                        print(f"Page is closed before screenshot, creating a new page...")
-                        
-                        # Create a new browser context if needed
-                        if not self.context or self.context.is_closed():
-                            print("Browser context is closed, creating new context...")
-                            try:
-                                self.context = await self.browser.new_context(
-                                    viewport={"width": 1425, "height": 776},
-                                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                                )
-                                print("Created new browser context")
-                            except Exception as ctx_err:
-                                print(f"Error creating browser context: {ctx_err}")
-                                last_error = ctx_err
-                                
-                                if attempt_count == max_attempts:
-                                    return {
-                                        "status": "error", 
-                                        "message": f"Browser context creation failed: {str(ctx_err)}",
-                                        "debug_screenshots": debug_screenshots
-                                    }
-                                else:
-                                    # Try to recreate the browser itself
-                                    try:
-                                        print("Attempting to recreate entire browser instance...")
-                                        if self.browser:
-                                            await self.browser.close()
-                                        self.browser = await self.playwright.chromium.launch(headless=False)
-                                        self.context = await self.browser.new_context(
-                                            viewport={"width": 1425, "height": 776}
-                                        )
-                                        self.browser_initialized = True
-                                        print("Browser instance successfully recreated")
-                                    except Exception as browser_err:
-                                        print(f"Failed to recreate browser: {browser_err}")
-                                    
-                                    await asyncio.sleep(1)
-                                    continue
-                        
-                        # Create a new page
-                        try:
-                            print("Creating new page for screenshot...")
-                            page = await self.context.new_page()
-                            
-                            # Replace or add the page in the pages list
-                            if page_index < len(self.pages):
-                                self.pages[page_index] = page
-                            else:
-                                self.pages.append(page)
-                            
-                            print(f"New page created at index {page_index}")
-                            
-                            # Navigate to a blank page to ensure the page is ready
-                            await page.goto("about:blank")
-                            print("Navigated to blank page to initialize page state")
-                        except Exception as page_err:
-                            print(f"Error creating new page: {page_err}")
-                            last_error = page_err
-                            
-                            if attempt_count == max_attempts:
-                                return {
-                                    "status": "error", 
-                                    "message": f"Error creating page: {str(page_err)}",
-                                    "debug_screenshots": debug_screenshots
-                                }
-                            else:
-                                await asyncio.sleep(1)
-                                continue
-                except Exception as page_err:
-                    print(f"Error getting page for screenshot: {page_err}")
-                    last_error = page_err
-                    
-                    if attempt_count == max_attempts:
-                        return {
-                            "status": "error", 
-                            "message": f"Error with page: {str(page_err)}",
-                            "debug_screenshots": debug_screenshots
-                        }
-                    else:
-                        # For recovery on last attempt, try complete browser reset
-                        if attempt_count == max_attempts - 1:
-                            print("Attempting full browser reset as last resort...")
-                            try:
-                                # Close everything and start fresh
-                                if self.browser:
-                                    await self.browser.close()
-                                if self.playwright:
-                                    await self.playwright.stop()
-                                
-                                # Reinitialize playwright
-                                self.playwright = await async_playwright().start()
-                                self.browser = await self.playwright.chromium.launch(headless=False)
-                                self.context = await self.browser.new_context(
-                                    viewport={"width": 1425, "height": 776}
-                                )
-                                self.browser_initialized = True
-                                
-                                # Create a new page
-                                page = await self.context.new_page()
-                                self.pages = [page]
-                                
-                                print("Browser reset successful, retrying screenshot operation...")
-                            except Exception as reset_err:
-                                print(f"Browser reset failed: {reset_err}")
-                        
-                        await asyncio.sleep(1)
-                        continue
+                        return {"status": "error", "message": "Invalid page index", "debug_screenshots": list(debug_screenshots)}
+                    needs_recovery = False
                 
-                # Ensure filename has .png extension
-                if not filename.endswith(".png"):
-                    filename += ".png"
+                # A zero timeout means "wait forever" to Playwright, so stop once the budget is spent
+                remaining_ms = int((deadline - self._now()) * 1000)
+                if selector and remaining_ms <= 0:
+                    last_error = last_error or PlaywrightTimeoutError(f"Element not found: {selector}")
+                    break
                 
-                # Use full path for screenshot
-                full_path = self._get_screenshot_path(filename)
-                
-                # Configure screenshot options
-                screenshot_options = {
-                    "path": full_path,
-                    "full_page": full_page,
-                    "omit_background": omit_background
-                }
-                
-                # Take the screenshot based on whether a selector is provided
-                if selector:
-                    try:
-                        print(f"Taking screenshot of element with selector: {selector}")
-                        element = await page.wait_for_selector(selector, state="visible", timeout=5000)
-                        if not element:
-                            if attempt_count == max_attempts:
-                                return {"status": "error", "message": f"Element not found: {selector}", "debug_screenshots": debug_screenshots}
-                            else:
-                                print(f"Element not found, retrying in next attempt...")
-                                await asyncio.sleep(1)
-                                continue
-                        
-                        # Take a full page screenshot first for context
-                        debug_path = f"element_screenshot_context_{int(time.time())}.png"
-                        await page.screenshot(path=self._get_screenshot_path(debug_path))
-                        debug_screenshots.append(debug_path)
-                        print(f"Context screenshot saved to: {debug_path}")
-                        
-                        # Now take screenshot of just the element
-                        await element.screenshot(path=full_path)
-                        print(f"Element screenshot saved to: {full_path}")
-                    except Exception as e:
-                        print(f"Error taking element screenshot: {e}")
-                        last_error = e
-                        
-                        # Take a full page screenshot anyway for debugging
-                        debug_path = f"debug_failed_selector_{int(time.time())}.png"
-                        try:
-                            await page.screenshot(path=self._get_screenshot_path(debug_path))
-                            debug_screenshots.append(debug_path)
-                            print(f"Debug screenshot after element selection failure: {debug_path}")
-                        except Exception as debug_error:
-                            print(f"Failed to take debug screenshot: {debug_error}")
-                        
-                        if attempt_count == max_attempts:
-                            return {
-                                "status": "error", 
-                                "message": f"Error taking screenshot of element after {max_attempts} attempts: {str(e)}",
-                                "debug_screenshots": debug_screenshots,
-                                "selector": selector
-                            }
-                        else:
-                            # Try waiting longer for the element in next attempt
-                            await asyncio.sleep(1)
-                            continue
-                else:
-                    try:
-                        print(f"Taking screenshot of entire page...")
-                        await page.screenshot(**screenshot_options)
-                        print(f"Page screenshot saved to: {full_path}")
-                    except Exception as e:
-                        print(f"Error taking page screenshot: {e}")
-                        last_error = e
-                        
-                        if attempt_count == max_attempts:
-                            # Try with minimal options on last attempt
-                            try:
-                                print("Attempting screenshot with minimal options as last resort...")
-                                minimal_path = self._get_screenshot_path(f"minimal_fallback_{int(time.time())}.png")
-                                await page.screenshot(path=minimal_path)
-                                
-                                # If successful, we'll use this as our result
-                                print(f"Minimal screenshot succeeded and saved to: {minimal_path}")
-                                return {
-                                    "status": "success",
-                                    "message": f"Screenshot saved to {minimal_path} (using fallback method)",
-                                    "filename": minimal_path,
-                                    "used_fallback": True
-                                }
-                            except Exception as minimal_err:
-                                print(f"Even minimal screenshot failed: {minimal_err}")
-                                return {
-                                    "status": "error", 
-                                    "message": f"Error taking page screenshot after {max_attempts} attempts: {str(e)}",
-                                    "debug_screenshots": debug_screenshots
-                                }
-                        else:
-                            # Try with different options next time
-                            if attempt_count == 1:
-                                # On first failure, try without full_page
-                                full_page = False 
-                                print("Will retry without full_page option")
-                            elif attempt_count == 2:
-                                # On second failure, try without any options
-                                omit_background = False
-                                print("Will retry with minimal options")
-                                
-                            await asyncio.sleep(1)
-                            continue
+                await self._do_screenshot(page, full_path, selector, screenshot_options, debug_screenshots, ts,
+                                          capture_debug, remaining_ms)
                 
-                # If we reached here, the screenshot was successful
                 return {
                     "status": "success",
                     "message": f"Screenshot saved to {full_path}",
                     "filename": full_path,
                     "attempts": attempt_count,
-                    "debug_screenshots": debug_screenshots
+                    "debug_screenshots": list(debug_screenshots),
+                    "pending_write": True
                 }
                 
+            except ValueError as e:
+                # A bad page index won't get better by retrying or by replacing the context
+                return {"status": "error", "message": str(e), "debug_screenshots": list(debug_screenshots)}
             except Exception as e:
-                print(f"Unexpected error in screenshot function: {e}")
+                logger.debug("Screenshot attempt %s failed: %s", attempt_count, e)
                 last_error = e
+                # Ask the page rather than the message, which also says "closed" for
+                # network errors such as net::ERR_CONNECTION_CLOSED
+                if page is None or page.is_closed():
+                    needs_recovery = True
                 
-                # On final attempt, try emergency screenshot
-                if attempt_count == max_attempts:
+                if selector:
+                    # Take a full page screenshot anyway for debugging
+                    debug_path = f"debug_failed_selector_{ts}_{attempt_count}.png"
                     try:
-                        # One last desperate attempt
-                        emergency_path = self._get_screenshot_path(f"emergency_{int(time.time())}.png")
-                        if page and not page.is_closed():
-                            await page.screenshot(path=emergency_path)
-                            return {
-                                "status": "partial_success",
-                                "message": f"Screenshot saved with emergency fallback: {emergency_path}",
-                                "filename": emergency_path,
-                                "original_error": str(e),
-                                "debug_screenshots": debug_screenshots
-                            }
-                    except Exception:
-                        pass
-                    
-                    return {
-                        "status": "error", 
-                        "message": f"Screenshot failed after {max_attempts} attempts: {str(e)}",
-                        "debug_screenshots": debug_screenshots
-                    }
+                        await self._capture_screenshot(page, self._get_screenshot_path(debug_path), _AUX_SCREENSHOT_TIMEOUT_MS)
+                        debug_screenshots.append(debug_path)
+                        logger.debug("Debug screenshot after element selection failure: %s", debug_path)
+                    except Exception as debug_error:
+                        logger.debug("Failed to take debug screenshot: %s", debug_error)
+                elif attempt_count == 1:
+                    # On first failure, try without full_page. Copy rather than modify,
+                    # since the options may be the shared defaults
+                    if screenshot_options["full_page"]:
+                        screenshot_options = {**screenshot_options, "full_page": False}
+                    logger.debug("Will retry without full_page option")
+                elif attempt_count == 2:
+                    # On second failure, try without any options
+                    if screenshot_options["omit_background"]:
+                        screenshot_options = {**screenshot_options, "omit_background": False}
+                    logger.debug("Will retry with minimal options")
+                
+                # An element wait already took up to its timeout, so retry it right
+                # away; other failures back off from about 50 ms, capped near 1 s
+                if attempt_count < max_attempts and not selector:
+                    await asyncio.sleep(self._retry_delay(attempt_count, base=0.05, cap=1.0))
+        
+        # Try with minimal options as a last resort for whole-page screenshots. needs_recovery
+        # already says whether the last failure left the page closed, so no is_closed() check.
+        if not selector and page and not needs_recovery:
+            try:
+                logger.debug("Attempting screenshot with minimal options as last resort...")
+                minimal_path = self._get_screenshot_path(f"minimal_fallback_{ts}.png")
+                await self._capture_screenshot(page, minimal_path, _FALLBACK_SCREENSHOT_TIMEOUT_MS)
                 
-                await asyncio.sleep(1)
-                continue
+                logger.debug("Minimal screenshot succeeded and saved to: %s", minimal_path)
+                return {
+                    "status": "success",
+                    "message": f"Screenshot saved to {minimal_path} (using fallback method)",
+                    "filename": minimal_path,
+                    "used_fallback": True
+                }
+            except Exception as minimal_err:
+                logger.debug("Even minimal screenshot failed: %s", minimal_err)
+        
+        error_result = {
+            "status": "error", 
+            "message": f"Screenshot failed after {max_attempts} attempts: {str(last_error)}",
+            "debug_screenshots": list(debug_screenshots)
+        }
+        if selector:
+            error_result["selector"] = selector
+        return error_result
 
-    async def playwright_click(self, selector: str, page_index: int = 0, 
+    @_with_page
+    async def playwright_click(self, page: Page, selector: str, page_index: int = 0, 
                               capture_screenshot: bool = False) -> Dict[str, Any]:
         """Click on an element."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
-            # Common selectors for cookie accept buttons if the given selector doesn't work
-            common_cookie_selectors = [
-                selector,  # Try the provided selector first
-                "#accept-cookies", 
-                ".cookie-accept", 
-                "[aria-label='Accept cookies']", 
-                "[aria-label='Accept All']",
-                "[aria-label='Accept all']",
-                "button:has-text('Accept')",
-                "button:has-text('Accept All')",
-                "button:has-text('Accept all')",
-                "button:has-text('I accept')",
-                "button:has-text('Allow all')",
-                "button:has-text('Allow cookies')"
-            ]
-            
             # If this is likely a cookie consent button
-            if "cookie" in selector.lower() or "accept" in selector.lower() or "consent" in selector.lower():
-                print(f"Looks like a cookie button. Trying various selectors...")
+            lowered = selector.lower()
+            if any(keyword in lowered for keyword in _COOKIE_KEYWORDS):
+                logger.debug("Looks like a cookie button. Trying various selectors...")
                 
-                # Try each selector
-                for cookie_selector in common_cookie_selectors:
-                    try:
-                        print(f"Trying selector: {cookie_selector}")
-                        # Wait a short time for each selector
-                        is_visible = await page.is_visible(cookie_selector, timeout=1000)
-                        if is_visible:
-                            print(f"Found visible element with selector: {cookie_selector}")
-                            await page.click(cookie_selector)
-                            
-                            result = {
-                                "status": "success",
-                                "message": f"Clicked on {cookie_selector}"
-                            }
-                            
-                            if capture_screenshot:
-                                screenshot_path = self._get_screenshot_path(f"click_{asyncio.get_event_loop().time()}.png")
-                                await page.screenshot(path=screenshot_path)
-                                result["screenshot"] = screenshot_path
-                                print(f"Screenshot saved to: {screenshot_path}")
-                                
-                            return result
-                    except Exception as selector_error:
-                        # Continue to the next selector
-                        continue
+                # Try the provided selector first, with a short head start
+                try:
+                    await page.locator(selector).locator("visible=true").first.click(timeout=1000)
+                    
+                    result = {
+                        "status": "success",
+                        "message": f"Clicked on {selector}"
+                    }
+                    
+                    await self._maybe_capture(page, "click", result, capture_screenshot)
+                    
+                    return result
+                except PlaywrightError as selector_error:
+                    logger.debug("Cookie selector %s not clickable (%s), trying common ones", selector, selector_error)
+                
+                # Then one locator over the common ones, limited to visible matches
+                cookie_button = (page.locator(_CSS_COOKIE_UNION)
+                                 .or_(page.locator(_TEXT_COOKIE_UNION))
+                                 .locator("visible=true")
+                                 .first)
+                try:
+                    await cookie_button.wait_for(state="visible", timeout=1500)
+                except PlaywrightTimeoutError:
+                    return {"status": "error", "message": f"Could not find any cookie consent button to click"}
+                
+                # Describe the element actually clicked, since it isn't the one asked for
+                clicked = await cookie_button.evaluate(
+                    "el => el.outerHTML.slice(0, el.outerHTML.indexOf('>') + 1).slice(0, 120)"
+                )
+                await cookie_button.click()
                 
-                # If we get here, none of the selectors worked
-                return {"status": "error", "message": f"Could not find any cookie consent button to click"}
+                result = {
+                    "status": "success",
+                    "message": f"Clicked on common cookie consent button {clicked} instead of {selector}",
+                    "fallback_used": True,
+                    "clicked_element": clicked
+                }
+                
+                await self._maybe_capture(page, "click", result, capture_screenshot)
+                    
+                return result
             
-            # For non-cookie buttons, just use the provided selector
-            print(f"Waiting for selector to be visible: {selector}")
-            await page.wait_for_selector(selector, state="visible")
+            # For non-cookie buttons, just use the provided selector; click waits for it to be actionable
+            logger.debug("Clicking selector: %s", selector)
             await page.click(selector)
             
             result = {
@@ -1965,11 +1260,7 @@ class PlaywrightTools:
                 "message": f"Clicked on {selector}"
             }
             
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"click_{asyncio.get_event_loop().time()}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
+            await self._maybe_capture(page, "click", result, capture_screenshot)
                 
             return result
             
@@ -1977,38 +1268,39 @@ class PlaywrightTools:
             return {"status": "error", "message": str(e)}
 
     async def playwright_click_and_switch_tab(self, selector: str, page_index: int = 0,
-                                            capture_screenshot: bool = False) -> Dict[str, Any]:
-        """Click on an element that opens a new tab and switch to it."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+                                            capture_screenshot: bool = False,
+                                            wait_for_networkidle: bool = False) -> Dict[str, Any]:
+        """Click on an element that opens a new tab and switch to it.
+        
+        Args:
+            selector: Selector of the element that opens the new tab
+            page_index: Index of the page to click on
+            capture_screenshot: Whether to capture a screenshot of the new tab
+            wait_for_networkidle: Whether to also wait (up to 10 seconds) for the new tab's network to go idle
+        """
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
-            # Wait for the element to be visible
-            await page.wait_for_selector(selector, state="visible")
-            
-            # Get the current number of pages
-            initial_pages_count = len(self.pages)
-            
-            # Start listening for new pages
+            # Start listening for new pages; the click itself waits for the element to be visible
             async with page.expect_popup() as popup_info:
-                await page.click(selector)
+                await page.locator(selector).click()
             
-            # Get the new page
+            # Get the new page, reusing the slot of a closed page if there is one
             new_page = await popup_info.value
-            self.pages.append(new_page)
-            new_page_index = len(self.pages) - 1
+            try:
+                new_page_index = self._add_page(new_page)
+            except ValueError as e:
+                # There is no slot to track the new tab in, so don't leave it open
+                await new_page.close()
+                return {"status": "error", "message": str(e)}
             
             # Set up console log listeners for the new page
-            new_page.on("console", lambda msg: self.console_logs.append({
-                "type": msg.type,
-                "text": msg.text,
-                "location": msg.location,
-                "time": asyncio.get_event_loop().time()
-            }))
+            new_page.on("console", self._on_console)
             
             # Wait for the new page to load
-            await new_page.wait_for_load_state("networkidle")
+            await self._wait_for_load(new_page, wait_for_networkidle)
             
             result = {
                 "status": "success",
@@ -2018,11 +1310,7 @@ class PlaywrightTools:
                 "url": new_page.url
             }
             
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"new_tab_{asyncio.get_event_loop().time()}.png")
-                await new_page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
+            await self._maybe_capture(new_page, "new_tab", result, capture_screenshot)
             
             return result
             
@@ -2032,23 +1320,27 @@ class PlaywrightTools:
     async def playwright_iframe_click(self, iframe_selector: str, element_selector: str,
                                      page_index: int = 0, capture_screenshot: bool = False) -> Dict[str, Any]:
         """Click on an element inside an iframe."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Wait for iframe
-            iframe = await page.wait_for_selector(iframe_selector)
-            if not iframe:
-                return {"status": "error", "message": f"Iframe not found: {iframe_selector}"}
-            
-            # Get the content frame
-            frame = await iframe.content_frame()
-            if not frame:
-                return {"status": "error", "message": "Could not access iframe content"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
+        
+        try:
+            # Reuse the content frame found for this iframe earlier, unless it has gone away
+            frames = self._iframe_frames.setdefault(page, {})
+            frame = frames.get(iframe_selector)
+            if frame is None or frame.is_detached():
+                # Wait for iframe
+                iframe = await page.wait_for_selector(iframe_selector)
+                if not iframe:
+                    return {"status": "error", "message": f"Iframe not found: {iframe_selector}"}
+                
+                # Get the content frame
+                frame = await iframe.content_frame()
+                if not frame:
+                    return {"status": "error", "message": "Could not access iframe content"}
+                frames[iframe_selector] = frame
             
             # Click the element within the iframe
-            await frame.wait_for_selector(element_selector, state="visible")
             await frame.click(element_selector)
             
             result = {
@@ -2056,26 +1348,19 @@ class PlaywrightTools:
                 "message": f"Clicked on {element_selector} inside iframe {iframe_selector}"
             }
             
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"iframe_click_{asyncio.get_event_loop().time()}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
+            await self._maybe_capture(page, "iframe_click", result, capture_screenshot)
             
             return result
             
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_hover(self, selector: str, page_index: int = 0,
+    @_with_page
+    async def playwright_hover(self, page: Page, selector: str, page_index: int = 0,
                               capture_screenshot: bool = False) -> Dict[str, Any]:
         """Hover over an element."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
-            await page.wait_for_selector(selector, state="visible")
             await page.hover(selector)
             
             result = {
@@ -2083,28 +1368,21 @@ class PlaywrightTools:
                 "message": f"Hovered over {selector}"
             }
             
-            if capture_screenshot:
-                screenshot_path = self._get_screenshot_path(f"hover_{asyncio.get_event_loop().time()}.png")
-                await page.screenshot(path=screenshot_path)
-                result["screenshot"] = screenshot_path
-                print(f"Screenshot saved to: {screenshot_path}")
+            await self._maybe_capture(page, "hover", result, capture_screenshot)
             
             return result
             
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_fill(self, selector: str, text: str, page_index: int = 0) -> Dict[str, Any]:
+    @_with_page
+    async def playwright_fill(self, page: Page, selector: str, text: str, page_index: int = 0) -> Dict[str, Any]:
         """Fill a form field."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
             # First attempt - standard fill approach
             try:
-                await page.wait_for_selector(selector, state="visible", timeout=5000)
-                await page.fill(selector, text)
+                await page.fill(selector, text, timeout=3000)
                 
                 return {
                     "status": "success",
@@ -2112,101 +1390,76 @@ class PlaywrightTools:
                     "strategy_used": "standard_fill"
                 }
             except PlaywrightTimeoutError:
-                # If standard approach fails, try the next approach
-                logger.info(f"Standard fill approach failed for '{selector}', trying with multi-strategy locate")
-                
-                # Try with multi-strategy locate
-                multi_strategy_result = await self.playwright_multi_strategy_locate(
-                    description=f"input field {selector.replace('[name=', '').replace(']', '')}",
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
-                
-                if multi_strategy_result["status"] == "success":
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using multi-strategy approach",
-                        "strategy_used": "multi_strategy",
-                        "details": multi_strategy_result
-                    }
-                
-                # Try with vision locator 
-                logger.info(f"Multi-strategy approach failed, trying with vision locator")
-                vision_result = await self.playwright_vision_locator(
-                    text="search", 
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
-                
-                if vision_result["status"] == "success":
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using vision locator",
-                        "strategy_used": "vision_locator",
-                        "details": vision_result
-                    }
+                logger.info("Standard fill approach failed for '%s', trying common search selectors", selector)
                 
-                # Try with accessibility tree
-                logger.info(f"Vision locator approach failed, trying with accessibility tree")
-                a11y_result = await self.playwright_accessibility_locator(
-                    description=f"search input field",
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
-                )
+                # Reuse the selector that stood in for this one earlier on the same document
+                resolved = self._resolved_selectors.get(page, {}).get(selector)
+                if resolved:
+                    try:
+                        await page.fill(resolved, text, timeout=1000)
+                        return {
+                            "status": "success",
+                            "message": f"Filled {resolved} with text using common selector patterns",
+                            "strategy_used": "common_selectors"
+                        }
+                    except PlaywrightError:
+                        self._resolved_selectors[page].pop(selector, None)
                 
-                if a11y_result["status"] == "success" and a11y_result.get("element_found"):
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using accessibility locator",
-                        "strategy_used": "accessibility_locator",
-                        "details": a11y_result
-                    }
+                # Cheap next step: common selectors for search inputs, probed concurrently
+                for common_selector in await self._visible_selectors(page, _COMMON_SEARCH_SELECTORS):
+                    try:
+                        await page.fill(common_selector, text)
+                        self._resolved_selectors.setdefault(page, {})[selector] = common_selector
+                        return {
+                            "status": "success",
+                            "message": f"Filled {common_selector} with text using common selector patterns",
+                            "strategy_used": "common_selectors"
+                        }
+                    except Exception:
+                        continue
                 
-                # Try with JavaScript evaluate as last resort
-                logger.info(f"All specialized locators failed, trying with JavaScript as last resort")
-                js_result = await self.playwright_js_locate(
-                    description=f"search input",
-                    action="fill",
-                    text_input=text,
-                    page_index=page_index
+                # Then the expensive locator strategies, each with its own time limit and all
+                # within one overall budget. A strategy this class doesn't provide is skipped.
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + 8.0
+                strategies = (
+                    # (strategy_used, method, seconds, needs element_found, description, extra kwargs)
+                    ("multi_strategy", "playwright_multi_strategy_locate", 2.0, False, "multi-strategy approach",
+                     {"description": f"input field {selector.replace('[name=', '').replace(']', '')}"}),
+                    ("vision_locator", "playwright_vision_locator", 3.0, False, "vision locator",
+                     {"text": "search"}),
+                    ("accessibility_locator", "playwright_accessibility_locator", 2.0, True, "accessibility locator",
+                     {"description": "search input field"}),
+                    ("js_locate", "playwright_js_locate", 2.0, True, "JavaScript locator",
+                     {"description": "search input"}),
                 )
                 
-                if js_result["status"] == "success" and js_result.get("element_found"):
-                    return {
-                        "status": "success",
-                        "message": f"Filled input using JavaScript locator",
-                        "strategy_used": "js_locate",
-                        "details": js_result
-                    }
-                
-                # If all approaches fail, try some common selectors for search inputs
-                common_search_selectors = [
-                    "input[type='search']",
-                    "input[type='text']",
-                    "input.search-box",
-                    "input.searchbox",
-                    "input.gLFyf",  # Google search class
-                    ".search-input",
-                    "#search-input",
-                    "[aria-label='Search']",
-                    "[placeholder*='Search']",
-                    "[placeholder*='search']"
-                ]
-                
-                for common_selector in common_search_selectors:
+                for strategy_used, method_name, seconds, needs_element, label, kwargs in strategies:
+                    locate = getattr(self, method_name, None)
+                    if locate is None:
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        logger.info("Fill fallback budget exhausted")
+                        break
+                    
+                    logger.info("Trying fill with %s", label)
                     try:
-                        if await page.is_visible(common_selector, timeout=1000):
-                            await page.fill(common_selector, text)
-                            return {
-                                "status": "success",
-                                "message": f"Filled {common_selector} with text using common selector patterns",
-                                "strategy_used": "common_selectors"
-                            }
-                    except Exception:
+                        strategy_result = await asyncio.wait_for(
+                            locate(action="fill", text_input=text, page_index=page_index, **kwargs),
+                            timeout=min(seconds, remaining)
+                        )
+                    except Exception as strategy_error:
+                        logger.info("Fill with %s failed: %s", label, strategy_error)
                         continue
+                    
+                    if strategy_result["status"] == "success" and (not needs_element or strategy_result.get("element_found")):
+                        return {
+                            "status": "success",
+                            "message": f"Filled input using {label}",
+                            "strategy_used": strategy_used,
+                            "details": strategy_result
+                        }
                 
                 # If we reach here, all approaches failed
                 return {
@@ -2219,14 +1472,11 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_select(self, selector: str, value: str, page_index: int = 0) -> Dict[str, Any]:
+    @_with_page
+    async def playwright_select(self, page: Page, selector: str, value: str, page_index: int = 0) -> Dict[str, Any]:
         """Select an option from a dropdown."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
-            await page.wait_for_selector(selector, state="visible")
             await page.select_option(selector, value)
             
             return {
@@ -2237,11 +1487,9 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_evaluate(self, script: str, page_index: int = 0) -> Dict[str, Any]:
+    @_with_page
+    async def playwright_evaluate(self, page: Page, script: str, page_index: int = 0) -> Dict[str, Any]:
         """Evaluate JavaScript in the page context."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
             result = await page.evaluate(script)
@@ -2256,14 +1504,18 @@ class PlaywrightTools:
 
     async def playwright_console_logs(self, page_index: int = 0, count: int = 10) -> Dict[str, Any]:
         """Get console logs from the page."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
+            # Pick up every event the background drainer hasn't processed yet
+            self._flush_console(limit=None)
+            
             # Get the most recent logs for this page
-            page_logs = [log for log in self.console_logs if log.get("page_index", 0) == page_index]
-            recent_logs = page_logs[-count:] if count < len(page_logs) else page_logs
+            page_logs = self._console_by_page.get(page_index, ())
+            # Walk back from the newest entry so only the returned logs are visited
+            recent_logs = list(itertools.islice(reversed(page_logs), max(0, count)))[::-1]
             
             return {
                 "status": "success",
@@ -2275,31 +1527,40 @@ class PlaywrightTools:
 
     async def playwright_close(self, page_index: int = 0) -> Dict[str, Any]:
         """Close a page."""
-        if page_index < 0 or page_index >= len(self.pages):
+        if page_index < 0 or page_index >= len(self.pages) or self.pages[page_index] is None:
             return {"status": "error", "message": "Invalid page index"}
         
         try:
             # Close the page
-            await self.pages[page_index].close()
+            page = self.pages[page_index]
+            await page.close()
             
-            # Remove from list
-            self.pages.pop(page_index)
+            # Free the slot; other pages keep their indices
+            self._on_page_close(page)
             
             return {
                 "status": "success",
                 "message": f"Closed page at index {page_index}",
-                "remaining_pages": len(self.pages)
+                "remaining_pages": sum(1 for page in self.pages if page is not None)
             }
             
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
     async def playwright_expect_response(self, url_pattern: str, timeout_ms: int = 30000,
-                                        page_index: int = 0) -> Dict[str, Any]:
-        """Wait for a specific HTTP response."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+                                        page_index: int = 0, return_headers: bool = False) -> Dict[str, Any]:
+        """Wait for a specific HTTP response.
+        
+        Args:
+            url_pattern: URL glob, regex or predicate the response must match
+            timeout_ms: How long to wait for the response
+            page_index: Index of the page to listen on
+            return_headers: Whether to include the response headers, which costs an extra
+                round-trip to the browser (off by default)
+        """
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Wait for response
@@ -2307,42 +1568,58 @@ class PlaywrightTools:
                 response = await response_info.value
             
             # Get response details
-            status = response.status
-            headers = await response.all_headers()
-            
-            return {
+            result = {
                 "status": "success",
                 "message": f"Received response from {response.url}",
-                "response_status": status,
-                "headers": headers
+                "response_status": response.status
             }
+            if return_headers:
+                result["headers"] = await response.all_headers()
+            
+            return result
             
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
     async def playwright_assert_response(self, url_pattern: str, status_code: int = 200,
-                                        page_index: int = 0) -> Dict[str, Any]:
-        """Assert that a response matches expectations."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+                                        page_index: int = 0, timeout_ms: int = 5000,
+                                        max_matches: int = 50) -> Dict[str, Any]:
+        """Assert that a response matches expectations.
+        
+        Args:
+            url_pattern: Substring the response URL must contain
+            status_code: Expected HTTP status of every matching response
+            page_index: Index of the page to listen on
+            timeout_ms: How long to wait for the first matching response
+            max_matches: How many of the most recent matching responses to check
+        """
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
-            # Create a callback to collect the responses
-            matching_responses = []
+            # Create a callback to collect (url, status) of the responses, keeping only the
+            # latest few; the Response objects themselves aren't held on to
+            matching_responses = collections.deque(maxlen=max(1, max_matches))
+            first_seen = asyncio.Event()
             
             def handle_response(response):
                 if url_pattern in response.url:
-                    matching_responses.append(response)
+                    matching_responses.append((response.url, response.status))
+                    first_seen.set()
             
             # Start listening for responses
             page.on("response", handle_response)
             
-            # Wait a bit to collect responses
-            await asyncio.sleep(2)
-            
-            # Stop listening
-            page.remove_listener("response", handle_response)
+            try:
+                # Wait for the first match, then briefly for any that arrive right behind it
+                await asyncio.wait_for(first_seen.wait(), timeout=timeout_ms / 1000)
+                await asyncio.sleep(0.1)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                # Stop listening
+                page.remove_listener("response", handle_response)
             
             # Check matches
             if not matching_responses:
@@ -2352,24 +1629,52 @@ class PlaywrightTools:
                 }
             
             # Check status codes
-            success = all(response.status == status_code for response in matching_responses)
+            success = all(status == status_code for _, status in matching_responses)
             
             return {
                 "status": "success" if success else "error",
                 "message": f"Response assertion {'passed' if success else 'failed'}",
                 "expected_status": status_code,
-                "actual_statuses": [response.status for response in matching_responses],
-                "urls": [response.url for response in matching_responses]
+                "actual_statuses": [status for _, status in matching_responses],
+                "urls": [url for url, _ in matching_responses]
             }
             
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_custom_user_agent(self, user_agent: str, page_index: int = 0) -> Dict[str, Any]:
-        """Set a custom user agent."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+    async def playwright_custom_user_agent(self, user_agent: str, page_index: int = 0,
+                                           new_context: bool = False) -> Dict[str, Any]:
+        """Set a custom user agent.
+        
+        Args:
+            user_agent: User agent string to use
+            page_index: Index of the page to set the user agent on
+            new_context: Switch to a fresh browser context created with this user agent, so it
+                applies to every page and to navigator.userAgent as well. This closes all open
+                pages; without it only the request header of the one page is changed.
+        """
+        if new_context:
+            try:
+                if user_agent != self.user_agent:
+                    self.user_agent = user_agent
+                    if self.browser_initialized:
+                        await self._replace_context()
+                
+                page = await self._get_page(page_index)
+                if not page:
+                    return {"status": "error", "message": "Invalid page index"}
+                
+                return {
+                    "status": "success",
+                    "message": f"Set custom user agent for a new browser context: {user_agent}"
+                }
+            
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+        
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             await page.set_extra_http_headers({"User-Agent": user_agent})
@@ -2382,11 +1687,9 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_get_visible_text(self, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
+    @_with_page
+    async def playwright_get_visible_text(self, page: Page, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
         """Get visible text from the page."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
             text = await page.text_content(selector)
@@ -2399,11 +1702,9 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_get_visible_html(self, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
+    @_with_page
+    async def playwright_get_visible_html(self, page: Page, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
         """Get visible HTML from the page."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
             html = await page.inner_html(selector)
@@ -2416,15 +1717,43 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_go_back(self, page_index: int = 0) -> Dict[str, Any]:
-        """Navigate back in the browser history."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+    @_with_page
+    async def playwright_get_visible(self, page: Page, selector: str = "body", page_index: int = 0) -> Dict[str, Any]:
+        """Get both the visible text and the HTML of an element in one round-trip.
+        
+        Args:
+            selector: Selector of the element to read (the first match is used)
+            page_index: Index of the page to read from
+        """
+        
+        try:
+            content = await page.locator(selector).first.evaluate(
+                "el => ({text: el.textContent, html: el.innerHTML})"
+            )
+            
+            return {
+                "status": "success",
+                "text": content["text"],
+                "html": content["html"]
+            }
+            
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def playwright_go_back(self, page_index: int = 0, wait_for_networkidle: bool = False) -> Dict[str, Any]:
+        """Navigate back in the browser history.
+        
+        Args:
+            page_index: Index of the page to navigate
+            wait_for_networkidle: Whether to also wait (up to 10 seconds) for the network to go idle
+        """
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             await page.go_back()
-            await page.wait_for_load_state("networkidle")
+            await self._wait_for_load(page, wait_for_networkidle)
             
             return {
                 "status": "success",
@@ -2436,15 +1765,20 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_go_forward(self, page_index: int = 0) -> Dict[str, Any]:
-        """Navigate forward in the browser history."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+    async def playwright_go_forward(self, page_index: int = 0, wait_for_networkidle: bool = False) -> Dict[str, Any]:
+        """Navigate forward in the browser history.
+        
+        Args:
+            page_index: Index of the page to navigate
+            wait_for_networkidle: Whether to also wait (up to 10 seconds) for the network to go idle
+        """
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             await page.go_forward()
-            await page.wait_for_load_state("networkidle")
+            await self._wait_for_load(page, wait_for_networkidle)
             
             return {
                 "status": "success",
@@ -2459,16 +1793,12 @@ class PlaywrightTools:
     async def playwright_drag(self, source_selector: str, target_selector: str,
                              page_index: int = 0) -> Dict[str, Any]:
         """Drag an element to another position."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
-            # Wait for elements
-            await page.wait_for_selector(source_selector, state="visible")
-            await page.wait_for_selector(target_selector, state="visible")
-            
-            # Perform drag and drop
+            # Perform drag and drop; it waits for both elements to be actionable
             await page.drag_and_drop(source_selector, target_selector)
             
             return {
@@ -2479,11 +1809,9 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_press_key(self, key: str, page_index: int = 0) -> Dict[str, Any]:
+    @_with_page
+    async def playwright_press_key(self, page: Page, key: str, page_index: int = 0) -> Dict[str, Any]:
         """Press a key."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
         
         try:
             await page.keyboard.press(key)
@@ -2496,17 +1824,29 @@ class PlaywrightTools:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def playwright_save_as_pdf(self, filename: str, page_index: int = 0) -> Dict[str, Any]:
-        """Save the page as PDF."""
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+    async def playwright_save_as_pdf(self, filename: str, page_index: int = 0, format: str = "A4",
+                                     print_background: bool = True, landscape: bool = False) -> Dict[str, Any]:
+        """Save the page as PDF.
+        
+        Args:
+            filename: Path of the PDF file to write
+            page_index: Index of the page to save
+            format: Paper format, e.g. "A4" or "Letter"
+            print_background: Whether to include background graphics
+            landscape: Whether to use landscape orientation
+        """
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             if not filename.endswith(".pdf"):
                 filename += ".pdf"
             
-            await page.pdf(path=filename)
+            pdf_bytes = await page.pdf(format=format, print_background=print_background, landscape=landscape)
+            
+            # Write the file on a worker thread so a large PDF doesn't block the event loop
+            await asyncio.to_thread(pathlib.Path(filename).write_bytes, pdf_bytes)
             
             return {
                 "status": "success",
@@ -2533,28 +1873,26 @@ class PlaywrightTools:
         """
         # Handle cases where selector is provided instead of text (for compatibility with LLM output)
         if selector is not None and text is None:
-            # Try to extract text from the selector
-            import re
-            
-            # Common patterns for selector with text
-            has_text_match = re.search(r":has-text\('([^']+)'\)", selector)
+            # Try to extract text from the selector using the common patterns,
+            # only running a pattern when its marker is present
+            has_text_match = _HAS_TEXT_RE.search(selector) if ":has-text(" in selector else None
             if has_text_match:
                 text = has_text_match.group(1)
-                print(f"Extracted text '{text}' from selector '{selector}'")
+                logger.debug("Extracted text '%s' from selector '%s'", text, selector)
             elif ":text(" in selector:
-                text_match = re.search(r":text\(['\"]([^'\"]+)['\"]\)", selector)
+                text_match = _TEXT_PSEUDO_RE.search(selector)
                 if text_match:
                     text = text_match.group(1)
-                    print(f"Extracted text '{text}' from selector '{selector}'")
+                    logger.debug("Extracted text '%s' from selector '%s'", text, selector)
             elif "aria-label" in selector:
-                label_match = re.search(r"\[aria-label=['\"]([^'\"]+)['\"]\]", selector)
+                label_match = _ARIA_LABEL_RE.search(selector)
                 if label_match:
                     text = label_match.group(1)
-                    print(f"Extracted text '{text}' from selector '{selector}'")
+                    logger.debug("Extracted text '%s' from selector '%s'", text, selector)
             else:
                 # If we couldn't extract text, use the selector as the text
                 text = selector
-                print(f"Using selector '{selector}' as text")
+                logger.debug("Using selector '%s' as text", selector)
         
         # Ensure we have text to click
         if text is None:
@@ -2566,120 +1904,138 @@ class PlaywrightTools:
         debug_screenshots = []
         page = None
         
+        # Give the document one short chance to finish loading so the checks below are plain
+        # DOM queries. This runs once rather than per attempt, since some pages (long polling,
+        # stuck subresources) never reach 'complete'.
+        try:
+            page = await self._get_page(page_index)
+            if page:
+                await page.wait_for_function("() => document.readyState === 'complete'", timeout=1500)
+        except PlaywrightTimeoutError:
+            logger.debug("Page still loading after 1.5s, probing selectors anyway")
+        except Exception as e:
+            # The attempts below get the page again and report any lasting problem
+            logger.debug("Could not check document readiness before smart click: %s", e)
+        
         while attempt_count < max_attempts:
             attempt_count += 1
-            print(f"Smart click attempt {attempt_count}/{max_attempts} for text: '{text}'")
+            logger.debug("Smart click attempt %s/%s for text: '%s'", attempt_count, max_attempts, text)
             
             try:
                 # Ensure browser is initialized
                 if not self.browser_initialized:
-                    print(f"Browser not initialized before smart_click, initializing now...")
+                    logger.debug("Browser not initialized before smart_click, initializing now...")
                     await self._ensure_browser_initialized()
-                    print(f"Browser initialized successfully for smart_click")
+                    logger.debug("Browser initialized successfully for smart_click")
                 
                 # Get the page
                 page = await self._get_page(page_index)
                 if not page:
                     return {"status": "error", "message": "Invalid page index"}
                 
-                # Extra validation for the page object
-                if page.is_closed():
-                    print("Page is closed, creating a new page...")
-                    page = await self.context.new_page()
-                    self.pages[page_index] = page
-                    print(f"Created new page at index {page_index}")
-                
-                print(f"Smart click looking for element with text: {text}")
-                
-                # Create variations of the text for fuzzy matching
-                text_variations = [
-                    text,
-                    text.lower(),
-                    text.upper(),
-                    text.title(),
-                ]
-                
-                # Generate selectors based on element type
-                selectors = []
-                
-                if element_type == "button" or element_type == "any":
-                    # Button selectors
-                    for variation in text_variations:
-                        selectors.extend([
-                            f"button:has-text('{variation}')",
-                            f"button[value='{variation}']",
-                            f"input[type='submit'][value='{variation}']",
-                            f"[role='button']:has-text('{variation}')",
-                        ])
-                
-                if element_type == "link" or element_type == "any":
-                    # Link selectors
-                    for variation in text_variations:
-                        selectors.extend([
-                            f"a:has-text('{variation}')",
-                            f"[role='link']:has-text('{variation}')"
-                        ])
+                logger.debug("Smart click looking for element with text: %s", text)
                 
-                if element_type == "any":
-                    # General selectors for any clickable element
-                    for variation in text_variations:
-                        selectors.extend([
-                            f":has-text('{variation}'):visible",
-                            f"[aria-label='{variation}']",
-                            f"[title='{variation}']",
-                        ])
+                # Selectors for the text, built once per (text, element_type, selector)
+                groups = _build_smart_selectors(text, element_type)
+                generated = tuple(itertools.chain.from_iterable(groups))
+                # All selectors in priority order, the caller's first
+                selectors = ((selector,) if selector is not None else ()) + generated
                 
-                # Also add the original selector if it was provided
+                # An explicit selector from the caller gets a short head start, since the union
+                # below clicks whichever match comes first in the document
                 if selector is not None:
-                    selectors.insert(0, selector)  # Try the exact selector first
-                
-                # Try each selector
-                for selector in selectors:
+                    explicit = page.locator(selector).locator("visible=true").first
                     try:
-                        if await page.is_visible(selector, timeout=1000):
-                            print(f"Smart click found element with selector: {selector}")
-                            await page.click(selector)
-                            
-                            result = {
-                                "status": "success",
-                                "message": f"Smart click succeeded with selector: {selector}",
-                                "matched_text": text,
-                                "selector_used": selector
-                            }
-                            
-                            if capture_screenshot:
-                                screenshot_path = self._get_screenshot_path(f"smart_click_{int(asyncio.get_event_loop().time())}.png")
-                                await page.screenshot(path=screenshot_path)
-                                result["screenshot"] = screenshot_path
-                                print(f"Screenshot saved to: {screenshot_path}")
-                                
-                            return result
-                    except Exception:
-                        # Continue to next selector if this one fails
-                        continue
+                        await explicit.click(timeout=500)
+                        logger.debug("Smart click found element with the given selector")
+                        
+                        result = {
+                            "status": "success",
+                            "message": f"Smart click succeeded with selector: {selector}",
+                            "matched_text": text,
+                            "selector_used": selector
+                        }
+                        
+                        await self._maybe_capture(page, "smart_click", result, capture_screenshot)
+                        
+                        return result
+                    except PlaywrightError as explicit_error:
+                        logger.debug("Given selector not clickable (%s), trying generated selectors", explicit_error)
+                
+                # Then wait once for any generated selector to match a visible element, and click
+                # in the first group (buttons, links, generic) that has one. A timeout means none
+                # turned up in time; any other error (e.g. a selector that can't be joined) falls
+                # back to trying the selectors one by one.
+                candidates = ()
+                try:
+                    any_match = page.locator(", ".join(generated)).locator("visible=true").first
+                    await any_match.wait_for(state="visible", timeout=1500)
+                    for group in groups:
+                        combined = ", ".join(group)
+                        union = page.locator(combined).locator("visible=true")
+                        if not await union.count():
+                            continue
+                        await union.first.click(timeout=1500)
+                        logger.debug("Smart click found element with combined selector")
+                        
+                        result = {
+                            "status": "success",
+                            "message": f"Smart click succeeded with selector: {combined}",
+                            "matched_text": text,
+                            "selector_used": combined
+                        }
+                        
+                        await self._maybe_capture(page, "smart_click", result, capture_screenshot)
+                        
+                        return result
+                except PlaywrightTimeoutError:
+                    pass
+                except PlaywrightError as union_error:
+                    logger.debug("Combined selector failed (%s), racing selectors individually", union_error)
+                    candidates = selectors
+                
+                # Race the selectors individually and click the first that becomes visible
+                candidate = await self._first_visible(page, candidates) if candidates else None
+                if candidate:
+                    logger.debug("Smart click found element with selector: %s", candidate)
+                    await page.locator(candidate).locator("visible=true").first.click(timeout=1500)
+                    
+                    result = {
+                        "status": "success",
+                        "message": f"Smart click succeeded with selector: {candidate}",
+                        "matched_text": text,
+                        "selector_used": candidate
+                    }
+                    
+                    await self._maybe_capture(page, "smart_click", result, capture_screenshot)
+                    
+                    return result
                 
                 # If we reached this point and haven't returned, none of the selectors worked
                 if attempt_count == max_attempts:
                     error_result = {
                         "status": "error", 
                         "message": f"Smart click failed: Could not find clickable element matching '{text}'",
-                        "tried_selectors": selectors[:5]  # Return first few selectors tried (limit result size)
+                        "tried_selectors": list(selectors[:5])  # Return first few selectors tried (limit result size)
                     }
                     
                     # Take a screenshot of the failure state for debugging
                     if capture_screenshot:
                         try:
-                            failure_screenshot = f"smart_click_failure_{int(asyncio.get_event_loop().time())}.png"
-                            await page.screenshot(path=self._get_screenshot_path(failure_screenshot))
+                            failure_screenshot = f"smart_click_failure_{time.monotonic_ns()}.png"
+                            await self._capture_screenshot(page, self._get_screenshot_path(failure_screenshot), _AUX_SCREENSHOT_TIMEOUT_MS)
                             error_result["failure_screenshot"] = failure_screenshot
-                            print(f"Failure screenshot saved to: {failure_screenshot}")
+                            logger.debug("Failure screenshot saved to: %s", failure_screenshot)
                         except Exception:
                             pass
                         
                     return error_result
             
+            except ValueError as e:
+                # A bad page index won't get better by retrying
+                return {"status": "error", "message": str(e)}
             except Exception as e:
-                print(f"Error in playwright_smart_click attempt {attempt_count}: {str(e)}")
+                logger.warning("Error in playwright_smart_click attempt %s: %s", attempt_count, e)
                 last_error = e
                 
                 # If this is the last attempt, return an error
@@ -2698,16 +2054,16 @@ class PlaywrightTools:
                             error_info["page_title"] = await page.title()
                             
                             if capture_screenshot:
-                                error_screenshot = f"smart_click_error_{int(asyncio.get_event_loop().time())}.png"
-                                await page.screenshot(path=self._get_screenshot_path(error_screenshot))
+                                error_screenshot = f"smart_click_error_{time.monotonic_ns()}.png"
+                                await self._capture_screenshot(page, self._get_screenshot_path(error_screenshot), _AUX_SCREENSHOT_TIMEOUT_MS)
                                 error_info["error_screenshot"] = error_screenshot
                         except Exception:
                             pass
                     
                     return error_info
                 
-                # Otherwise, wait a bit and try again
-                await asyncio.sleep(1)
+                # Otherwise, back off and try again
+                await asyncio.sleep(self._full_jitter_delay(attempt_count, base=0.05, cap=1.0))
                 continue
 
     # === Dialog Handling Methods ===
@@ -2723,9 +2079,9 @@ class PlaywrightTools:
             prompt_text: Text to enter for prompt dialogs
             page_index: Index of the page to set dialog handler on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Define a reusable dialog handler
@@ -2733,7 +2089,7 @@ class PlaywrightTools:
                 dialog_type = dialog.type
                 dialog_message = dialog.message
                 
-                print(f"Dialog appeared: {dialog_type} - {dialog_message}")
+                logger.debug("Dialog appeared: %s - %s", dialog_type, dialog_message)
                 
                 if action.lower() == "accept":
                     if dialog_type == "prompt" and prompt_text:
@@ -2743,11 +2099,8 @@ class PlaywrightTools:
                 else:  # Default to dismiss
                     await dialog.dismiss()
             
-            # Remove any existing handlers first to avoid conflicts
-            page.remove_listener("dialog", None)
-            
-            # Set the new handler
-            page.on("dialog", handle_dialog)
+            # Replace any existing handler so only one answers each dialog
+            self._install_dialog_handler(page, handle_dialog)
             
             return {
                 "status": "success",
@@ -2766,13 +2119,13 @@ class PlaywrightTools:
         Args:
             page_index: Index of the page to remove dialog handlers from
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
-            # Remove all dialog handlers
-            page.remove_listener("dialog", None)
+            # Remove the persistent dialog handler
+            self._install_dialog_handler(page, None)
             
             return {
                 "status": "success",
@@ -2793,20 +2146,20 @@ class PlaywrightTools:
             handle_once: Whether to remove the handler after handling one dialog
             page_index: Index of the page to set dialog handler on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Create future to track when dialog appears
             dialog_info = {"appeared": False, "type": None, "message": None}
             
-            # Define a handler that will self-remove after one dialog if requested
+            # Define a handler for the next dialog (or for every dialog unless handle_once)
             async def handle_one_dialog(dialog):
                 dialog_type = dialog.type
                 dialog_message = dialog.message
                 
-                print(f"Dialog appeared: {dialog_type} - {dialog_message}")
+                logger.debug("Dialog appeared: %s - %s", dialog_type, dialog_message)
                 
                 # Update dialog info
                 dialog_info["appeared"] = True
@@ -2824,16 +2177,13 @@ class PlaywrightTools:
                     await dialog.dismiss()
                 
                 dialog_info["action_taken"] = action
-                
-                # Set the future result
-                if not dialog_future.done():
-                    dialog_future.set_result(dialog_info)
-                
-                # Remove the listener
-                page.remove_listener("dialog", handle_one_dialog)
             
-            # Set the handler
-            page.on("dialog", handle_one_dialog)
+            # Set the handler; a one-off handler is removed by Playwright once it has fired,
+            # a lasting one replaces the page's persistent handler
+            if handle_once:
+                page.once("dialog", handle_one_dialog)
+            else:
+                self._install_dialog_handler(page, handle_one_dialog)
             
             return {
                 "status": "success",
@@ -2848,6 +2198,44 @@ class PlaywrightTools:
 
     # === Additional Locator Methods ===
     
+    async def _describe_locator(self, locator, start: int = 0, limit: int = 5) -> tuple:
+        """Count a locator's matches and describe some of them in a single evaluate call.
+        
+        Visibility and bounding boxes are worked out in the page rather than through
+        Playwright, so they are approximate; use locator.is_visible() for an element
+        that is about to be acted on.
+        
+        Args:
+            locator: Locator whose matches to describe
+            start: Index of the first match to describe; negative counts from the end
+            limit: Maximum number of matches to describe
+        
+        Returns:
+            (count, elements): the number of matches and a list of dicts with
+            index, tag, text, is_visible and bounding_box for the described ones
+        """
+        described = await locator.evaluate_all(
+            """(els, [start, limit]) => {
+                // A negative start counts from the end, like locator.nth()
+                const first = start < 0 ? els.length + start : start;
+                if (first < 0) return [els.length, []];
+                return [els.length, els.slice(first, first + limit).map((el, i) => {
+                    const text = el.textContent || "";
+                    const rect = el.getBoundingClientRect();
+                    const hasBox = rect.width > 0 && rect.height > 0;
+                    return {
+                        index: first + i,
+                        tag: el.tagName.toLowerCase(),
+                        text: text.trim().slice(0, 50) + (text.length > 50 ? "..." : ""),
+                        is_visible: hasBox && getComputedStyle(el).visibility !== "hidden",
+                        bounding_box: hasBox ? {x: rect.x, y: rect.y, width: rect.width, height: rect.height} : null
+                    };
+                })];
+            }""",
+            [start, limit]
+        )
+        return described[0], described[1]
+    
     async def playwright_css_locator(self, selector: str, action: str = "find", 
                                    text_input: str = "", page_index: int = 0) -> Dict[str, Any]:
         """
@@ -2860,46 +2248,22 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Create locator with CSS
             locator = page.locator(f"css={selector}")
             
-            # Check if element exists
-            count = await locator.count()
+            # Count the elements and describe the first 5 in one round-trip
+            count, elements_info = await self._describe_locator(locator)
             if count == 0:
                 return {
                     "status": "error",
                     "message": f"No elements found matching CSS selector: {selector}"
                 }
             
-            # Get information about found elements (limit to first 5)
-            elements_info = []
-            for i in range(min(count, 5)):
-                el = locator.nth(i)
-                is_visible = await el.is_visible()
-                
-                try:
-                    tag_name = await el.evaluate("el => el.tagName.toLowerCase()")
-                    text_content = await el.text_content() or ""
-                    text_content = text_content.strip()[:50] + ("..." if len(text_content) > 50 else "")
-                    bounding_box = await el.bounding_box()
-                except Exception:
-                    tag_name = "unknown"
-                    text_content = ""
-                    bounding_box = None
-                
-                elements_info.append({
-                    "index": i,
-                    "tag": tag_name,
-                    "text": text_content,
-                    "is_visible": is_visible,
-                    "bounding_box": bounding_box
-                })
-            
             # Perform the requested action on the first element
             action_result = None
             if action == "click":
@@ -2932,14 +2296,14 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Create locator and get nth element
             locator = page.locator(selector)
-            count = await locator.count()
+            count, described = await self._describe_locator(locator, start=index, limit=1)
             
             if count == 0:
                 return {
@@ -2947,7 +2311,8 @@ class PlaywrightTools:
                     "message": f"No elements found matching selector: {selector}"
                 }
             
-            if index >= count:
+            # Nothing is described for an index past either end
+            if not described:
                 return {
                     "status": "error",
                     "message": f"Index {index} out of range, only {count} elements found"
@@ -2955,22 +2320,7 @@ class PlaywrightTools:
             
             # Get the nth element
             element = locator.nth(index)
-            is_visible = await element.is_visible()
-            
-            # Get element info
-            tag_name = await element.evaluate("el => el.tagName.toLowerCase()")
-            text_content = await element.text_content() or ""
-            text_content = text_content.strip()[:50] + ("..." if len(text_content) > 50 else "")
-            bounding_box = await element.bounding_box()
-            
-            element_info = {
-                "index": index,
-                "tag": tag_name,
-                "text": text_content,
-                "is_visible": is_visible,
-                "bounding_box": bounding_box,
-                "total_elements": count
-            }
+            element_info = {**described[0], "total_elements": count}
             
             # Perform the requested action
             action_result = None
@@ -3003,27 +2353,20 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
-            # Check if child exists
+            # Describe the parent of the first match and act on it in a single evaluate; the
+            # text is passed as an argument so quotes in it can't break the script
             child = page.locator(selector)
-            count = await child.count()
-            
-            if count == 0:
-                return {
-                    "status": "error",
-                    "message": f"No elements found matching selector: {selector}"
-                }
-            
-            # Get the parent using JavaScript evaluation
-            parent = await child.first.evaluate("""(element) => {
-                const parent = element.parentElement;
-                if (!parent) return null;
+            found = await child.evaluate_all("""(elements, [action, text]) => {
+                if (!elements.length) return null;
+                const parent = elements[0].parentElement;
+                if (!parent) return {parent: null};
                 
-                return {
+                const info = {
                     tagName: parent.tagName.toLowerCase(),
                     id: parent.id || undefined,
                     className: parent.className || undefined,
@@ -3031,25 +2374,38 @@ class PlaywrightTools:
                     hasChildren: parent.children.length > 0,
                     childrenCount: parent.children.length
                 };
-            }""")
+                
+                if (action === "click") {
+                    parent.click();
+                } else if (action === "fill" && text) {
+                    // For fill, we find an input within the parent if possible
+                    const input = parent.querySelector('input, textarea');
+                    if (input) {
+                        input.value = text;
+                        input.dispatchEvent(new Event('input', {bubbles: true}));
+                    }
+                }
+                return {parent: info};
+            }""", [action, text_input])
+            
+            if found is None:
+                return {
+                    "status": "error",
+                    "message": f"No elements found matching selector: {selector}"
+                }
             
+            parent = found["parent"]
             if not parent:
                 return {
                     "status": "error",
                     "message": f"Element found, but it has no parent element"
                 }
             
-            # Perform the requested action on the parent
+            # Report the action performed on the parent
             action_result = None
             if action == "click":
-                # Evaluating JavaScript to click since we don't have a direct locator
-                await child.first.evaluate("el => el.parentElement.click()")
                 action_result = "Clicked parent element"
             elif action == "fill" and text_input:
-                # For fill, we find an input within the parent if possible
-                await child.first.evaluate(
-                    f"el => {{ const input = el.parentElement.querySelector('input, textarea'); if(input) input.value = '{text_input}'; }}"
-                )
                 action_result = f"Attempted to fill input within parent with '{text_input}'"
             
             return {
@@ -3074,46 +2430,22 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Create locator with XPath
             locator = page.locator(f"xpath={xpath}")
             
-            # Check if element exists
-            count = await locator.count()
+            # Count the elements and describe the first 5 in one round-trip
+            count, elements_info = await self._describe_locator(locator)
             if count == 0:
                 return {
                     "status": "error",
                     "message": f"No elements found matching XPath: {xpath}"
                 }
             
-            # Get information about found elements (limit to first 5)
-            elements_info = []
-            for i in range(min(count, 5)):
-                el = locator.nth(i)
-                is_visible = await el.is_visible()
-                
-                try:
-                    tag_name = await el.evaluate("el => el.tagName.toLowerCase()")
-                    text_content = await el.text_content() or ""
-                    text_content = text_content.strip()[:50] + ("..." if len(text_content) > 50 else "")
-                    bounding_box = await el.bounding_box()
-                except Exception:
-                    tag_name = "unknown"
-                    text_content = ""
-                    bounding_box = None
-                
-                elements_info.append({
-                    "index": i,
-                    "tag": tag_name,
-                    "text": text_content,
-                    "is_visible": is_visible,
-                    "bounding_box": bounding_box
-                })
-            
             # Perform the requested action on the first element
             action_result = None
             if action == "click":
@@ -3148,9 +2480,9 @@ class PlaywrightTools:
             exact: Whether to match the exact label text
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Use Playwright's getByLabel method
@@ -3200,66 +2532,6 @@ class PlaywrightTools:
 
     # === Accessibility Methods ===
     
-    async def playwright_accessibility_snapshot(self, selector: str = "", 
-                                              page_index: int = 0) -> Dict[str, Any]:
-        """
-        Get a snapshot of the accessibility tree for debugging or testing.
-        
-        Args:
-            selector: Optional selector to get snapshot for specific element
-            page_index: Index of the page to operate on
-        """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
-        
-        try:
-            # Get the accessibility snapshot
-            if selector:
-                element = await page.wait_for_selector(selector, timeout=5000)
-                if not element:
-                    return {
-                        "status": "error",
-                        "message": f"Element not found: {selector}"
-                    }
-                snapshot = await page.accessibility.snapshot(root=element)
-            else:
-                snapshot = await page.accessibility.snapshot()
-            
-            # Process snapshot to make it more readable/useful
-            def process_node(node, depth=0):
-                processed = {
-                    "role": node.get("role", ""),
-                    "name": node.get("name", ""),
-                    "depth": depth
-                }
-                
-                # Add optional properties if they exist
-                for prop in ["value", "description", "checked", "pressed"]:
-                    if prop in node:
-                        processed[prop] = node[prop]
-                
-                # Process children recursively
-                if "children" in node and node["children"]:
-                    processed["children"] = [
-                        process_node(child, depth + 1) 
-                        for child in node["children"]
-                    ]
-                    
-                return processed
-            
-            # Process the snapshot
-            processed_snapshot = process_node(snapshot) if snapshot else {}
-            
-            return {
-                "status": "success",
-                "message": "Accessibility snapshot captured",
-                "snapshot": processed_snapshot
-            }
-            
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-    
     async def playwright_find_by_role(self, role: str, name: str = "", exact: bool = False,
                                     action: str = "find", text_input: str = "",
                                     page_index: int = 0) -> Dict[str, Any]:
@@ -3274,19 +2546,17 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
-            # Configure options for get_by_role
-            options = {}
-            if name is not None:
-                options["name"] = name
-                options["exact"] = exact
-            
-            # Use the role locator
-            locator = page.get_by_role(role, **options)
+            # Use the role locator, filtering by name only when one is given; an empty
+            # name would otherwise only match elements without an accessible name
+            if name:
+                locator = page.get_by_role(role, name=name, exact=exact)
+            else:
+                locator = page.get_by_role(role)
             
             # Check if element exists
             count = await locator.count()
@@ -3341,9 +2611,9 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Use the label locator
@@ -3401,9 +2671,9 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Use the placeholder locator
@@ -3460,9 +2730,9 @@ class PlaywrightTools:
             action: Action to perform ('find', 'click')
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Use the alt text locator
@@ -3499,8 +2769,8 @@ class PlaywrightTools:
                         }
                     }""", first_element.evaluate("el => CSS.escape(el.outerHTML)"))
                     
-                    screenshot_path = f"vision_locator_{int(time.time())}.png"
-                    await page.screenshot(path=screenshot_path)
+                    screenshot_path = f"vision_locator_{time.monotonic_ns()}.png"
+                    await self._capture_screenshot(page, screenshot_path, _AUX_SCREENSHOT_TIMEOUT_MS)
                     
                     # Remove the highlight
                     await page.evaluate("""(selector) => {
@@ -3539,9 +2809,9 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Use the title locator
@@ -3603,9 +2873,9 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Build the CSS selector with text pseudo-classes
@@ -3646,7 +2916,7 @@ class PlaywrightTools:
                     text_content = ""
                 
                 # Log or process each element's info as needed
-                print(f"Found element {i}: {tag_name}, visible: {is_visible}, text: {text_content}")
+                logger.debug("Found element %s: %s, visible: %s, text: %s", i, tag_name, is_visible, text_content)
             
             # Perform the requested action on the first element
             action_result = None
@@ -3680,9 +2950,9 @@ class PlaywrightTools:
             text_input: Text to input if action is 'fill'
             page_index: Index of the page to operate on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Add :visible pseudo-class if requested
@@ -3718,7 +2988,7 @@ class PlaywrightTools:
                     text_content = ""
                 
                 # Log or process each element's info as needed
-                print(f"Found element {i}: {tag_name}, visible: {is_visible}, text: {text_content}")
+                logger.debug("Found element %s: %s, visible: %s, text: %s", i, tag_name, is_visible, text_content)
             
             # Perform the requested action on the first element
             action_result = None
@@ -3752,9 +3022,9 @@ class PlaywrightTools:
             interesting_only: Whether to include only elements with interesting accessibility properties
             page_index: Index of the page to snapshot
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Configure snapshot options
@@ -3777,35 +3047,12 @@ class PlaywrightTools:
             snapshot = await page.accessibility.snapshot(**options)
             
             # Process the snapshot to make it more useful
-            def process_node(node, depth=0):
-                # Base info all nodes should have
-                processed = {
-                    "role": node.get("role", ""),
-                    "name": node.get("name", ""),
-                    "depth": depth
-                }
-                
-                # Add optional properties if they exist
-                for prop in ["value", "description", "checked", "pressed", "level", 
-                             "selected", "expanded", "focused", "disabled"]:
-                    if prop in node:
-                        processed[prop] = node[prop]
-                
-                # Process children recursively
-                if "children" in node and node["children"]:
-                    processed["children"] = [
-                        process_node(child, depth + 1) 
-                        for child in node["children"]
-                    ]
-                
-                return processed
-            
             processed_snapshot = []
             if snapshot:
                 if isinstance(snapshot, list):
-                    processed_snapshot = [process_node(node) for node in snapshot]
+                    processed_snapshot = [_process_a11y_tree(node, _A11Y_PROPS_EXTENDED) for node in snapshot]
                 else:
-                    processed_snapshot = process_node(snapshot)
+                    processed_snapshot = _process_a11y_tree(snapshot, _A11Y_PROPS_EXTENDED)
             
             return {
                 "status": "success",
@@ -3829,9 +3076,9 @@ class PlaywrightTools:
             name: Optional accessible name to filter by
             page_index: Index of the page to search
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Get the accessibility snapshot
@@ -3916,17 +3163,17 @@ class PlaywrightTools:
             timeout_ms: Timeout in milliseconds
             page_index: Index of the page to navigate
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Make sure URLs have http/https prefix
-            if not url.startswith(('http://', 'https://')):
+            if not url.startswith(_URL_SCHEMES):
                 url = 'https://' + url
             
             # Start navigation and wait for the expected URL
-            print(f"Navigating to {url} and waiting for URL pattern: {expected_url}")
+            logger.debug("Navigating to %s and waiting for URL pattern: %s", url, expected_url)
             
             # Create a promise that will resolve when the URL changes to the expected one
             async with page.expect_navigation(url=expected_url, timeout=timeout_ms) as navigation_info:
@@ -3976,9 +3223,9 @@ class PlaywrightTools:
             timeout_ms: Timeout in milliseconds
             page_index: Index of the page to navigate
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Record starting URL
@@ -3990,24 +3237,24 @@ class PlaywrightTools:
                 "timeout": timeout_ms
             }
             
-            print(f"Waiting for navigation after {trigger_action} action")
+            logger.debug("Waiting for navigation after %s action", trigger_action)
             
             # Set up navigation waiter
             async with page.expect_navigation(**navigation_options) as navigation_info:
                 # Perform the requested action to trigger navigation
                 if trigger_action == "click" and selector:
                     await page.click(selector)
-                    print(f"Clicked on {selector}")
+                    logger.debug("Clicked on %s", selector)
                 elif trigger_action == "fill_and_press" and selector and text_input:
                     await page.fill(selector, text_input)
                     await page.press(selector, "Enter")
-                    print(f"Filled {selector} with '{text_input}' and pressed Enter")
+                    logger.debug("Filled %s with '%s' and pressed Enter", selector, text_input)
                 elif trigger_action == "go_back":
                     await page.go_back()
-                    print("Navigated back")
+                    logger.debug("Navigated back")
                 elif trigger_action == "go_forward":
                     await page.go_forward()
-                    print("Navigated forward")
+                    logger.debug("Navigated forward")
                 else:
                     return {
                         "status": "error",
@@ -4055,9 +3302,9 @@ class PlaywrightTools:
             timeout_ms: Timeout in milliseconds
             page_index: Index of the page to wait on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         # Default states if none provided
         if not states:
@@ -4073,7 +3320,7 @@ class PlaywrightTools:
             # Wait for each state in sequence
             for state in states:
                 try:
-                    print(f"Waiting for load state: {state}")
+                    logger.debug("Waiting for load state: %s", state)
                     await page.wait_for_load_state(state, timeout=timeout_ms)
                     timings[state] = time.time() - start_time
                 except Exception as e:
@@ -4113,9 +3360,9 @@ class PlaywrightTools:
             action: Action to take ('abort', 'continue', 'fulfill')
             page_index: Index of the page to intercept requests on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Set up the route
@@ -4152,9 +3399,9 @@ class PlaywrightTools:
             url_pattern: URL pattern to stop intercepting (default is all requests)
             page_index: Index of the page to stop interception on
         """
-        page = await self._get_page(page_index)
-        if not page:
-            return {"status": "error", "message": "Invalid page index"}
+        page, error = await self._page_or_error(page_index)
+        if error:
+            return error
         
         try:
             # Unregister all routes matching the pattern
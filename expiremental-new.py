@@ -30,6 +30,11 @@ try:
 except ImportError:
     print("python-dotenv package not found. Install with: pip install python-dotenv")
     def load_dotenv(): pass
+
+try:
+    import uvloop  # Optional faster event loop (not available on Windows)
+except ImportError:
+    uvloop = None
 import time
 import re
 
@@ -316,6 +321,7 @@ You can help users automate browser tasks by generating tool calls for actions s
 - playwright_hover - Hover over an element
 - playwright_get_visible_text - Extract visible text from the page
 - playwright_get_visible_html - Get HTML content
+- playwright_get_visible - Get both visible text and HTML content in one call
 - playwright_evaluate - Run JavaScript in the browser (use "script" parameter, NOT "pageFunction")
 - playwright_smart_click - Smart click with fallback strategies (use with "text" parameter, NOT "selector")
 - playwright_find_element - Find elements by description
@@ -1787,6 +1793,8 @@ async def main():
 if __name__ == "__main__":
     try:
         import time  # Import time module for timestamps
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\nExiting...")